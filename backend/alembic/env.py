@@ -0,0 +1,63 @@
+"""
+Alembic environment for the ChantierPlus backend
+
+Migrations run either from the command line (`alembic upgrade head`, using
+the async engine from app.database) or at application startup, where
+app.migrations passes an already open connection through
+config.attributes["connection"].
+"""
+from logging.config import fileConfig
+import asyncio
+
+from alembic import context
+
+from app.database import Base, engine
+from app.migrations import lock_migrations
+from app import models  # Import models to register them with SQLAlchemy
+
+config = context.config
+target_metadata = Base.metadata
+
+
+def do_run_migrations(connection):
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        # SQLite cannot ALTER most things in place, batch mode recreates tables
+        render_as_batch=connection.dialect.name == "sqlite",
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_async_migrations():
+    async with engine.connect() as connection:
+        # Startup migrations take the lock in run_migrations
+        await connection.run_sync(lock_migrations)
+        await connection.run_sync(do_run_migrations)
+        await connection.commit()
+
+
+def run_migrations_offline():
+    context.configure(
+        url=engine.url.render_as_string(hide_password=False),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+connection = config.attributes.get("connection")
+
+if connection is not None:
+    do_run_migrations(connection)
+elif context.is_offline_mode():
+    if config.config_file_name is not None:
+        fileConfig(config.config_file_name)
+    run_migrations_offline()
+else:
+    if config.config_file_name is not None:
+        fileConfig(config.config_file_name)
+    asyncio.run(run_async_migrations())
@@ -0,0 +1,62 @@
+"""Delivery jobs, content-addressed file store and token versions
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2025-01-02 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created by Base.metadata.create_all before migrations existed
+    # may already have some of these objects
+    inspector = sa.inspect(op.get_bind())
+    tables = inspector.get_table_names()
+
+    if "avenant_deliveries" not in tables:
+        op.create_table(
+            "avenant_deliveries",
+            sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+            sa.Column("avenant_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("avenants.id"), nullable=False, unique=True),
+            sa.Column("status", sa.String(), nullable=False),
+            sa.Column("attempts", sa.Integer(), nullable=False),
+            sa.Column("last_error", sa.Text(), nullable=True),
+            sa.Column("pdf_path", sa.Text(), nullable=True),
+            sa.Column("next_attempt_at", sa.DateTime(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+            sa.Column("updated_at", sa.DateTime(), server_default=sa.func.now()),
+        )
+
+    if "stored_files" not in tables:
+        op.create_table(
+            "stored_files",
+            sa.Column("file_id", sa.String(64), primary_key=True),
+            sa.Column("size", sa.Integer(), nullable=False),
+            sa.Column("mime_type", sa.String(), nullable=False),
+            sa.Column("ref_count", sa.Integer(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+            sa.Column("last_used_at", sa.DateTime(), nullable=False),
+        )
+
+    user_columns = {column["name"] for column in inspector.get_columns("user_profiles")}
+    if "token_version" not in user_columns:
+        with op.batch_alter_table("user_profiles") as batch_op:
+            batch_op.add_column(
+                sa.Column("token_version", sa.Integer(), nullable=False, server_default="0")
+            )
+
+
+def downgrade():
+    with op.batch_alter_table("user_profiles") as batch_op:
+        batch_op.drop_column("token_version")
+    op.drop_table("stored_files")
+    op.drop_table("avenant_deliveries")
@@ -0,0 +1,42 @@
+"""Indexes for the hot query paths
+
+- chantiers.company_id: read_chantiers lists the chantiers of a company
+- avenants(chantier_id, created_at): get_chantier_avenants filters by
+  chantier and orders by created_at DESC, the index serves both
+- user_profiles(company_id, role): owner lookup when sending avenants
+- avenant_deliveries(status, next_attempt_at): delivery worker polling
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2025-01-03 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ("ix_chantiers_company_id", "chantiers", ["company_id"]),
+    ("ix_avenants_chantier_id_created_at", "avenants", ["chantier_id", "created_at"]),
+    ("ix_user_profiles_company_id_role", "user_profiles", ["company_id", "role"]),
+    ("ix_avenant_deliveries_status_next_attempt_at", "avenant_deliveries", ["status", "next_attempt_at"]),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in INDEXES:
+        existing = {index["name"] for index in inspector.get_indexes(table)}
+        if name not in existing:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
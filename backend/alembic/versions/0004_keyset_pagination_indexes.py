@@ -0,0 +1,54 @@
+"""Composite indexes for keyset pagination on (created_at, id)
+
+Replaces the (company_id) and (chantier_id, created_at) indexes, which
+are prefixes of the new ones. On SQLite, created_at values written by
+CURRENT_TIMESTAMP (no fractional seconds) are rewritten in the format
+SQLAlchemy binds, so they compare correctly against pagination cursors.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2025-01-04 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def _index_names(table):
+    return {index["name"] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    if op.get_bind().dialect.name == "sqlite":
+        for table in ("chantiers", "avenants"):
+            op.execute(
+                f"UPDATE {table} SET created_at = created_at || '.000000' "
+                "WHERE length(created_at) = 19"
+            )
+
+    if "ix_chantiers_company_id_created_at_id" not in _index_names("chantiers"):
+        op.create_index(
+            "ix_chantiers_company_id_created_at_id", "chantiers", ["company_id", "created_at", "id"]
+        )
+    if "ix_chantiers_company_id" in _index_names("chantiers"):
+        op.drop_index("ix_chantiers_company_id", table_name="chantiers")
+
+    if "ix_avenants_chantier_id_created_at_id" not in _index_names("avenants"):
+        op.create_index(
+            "ix_avenants_chantier_id_created_at_id", "avenants", ["chantier_id", "created_at", "id"]
+        )
+    if "ix_avenants_chantier_id_created_at" in _index_names("avenants"):
+        op.drop_index("ix_avenants_chantier_id_created_at", table_name="avenants")
+
+
+def downgrade():
+    op.create_index("ix_avenants_chantier_id_created_at", "avenants", ["chantier_id", "created_at"])
+    op.drop_index("ix_avenants_chantier_id_created_at_id", table_name="avenants")
+    op.create_index("ix_chantiers_company_id", "chantiers", ["company_id"])
+    op.drop_index("ix_chantiers_company_id_created_at_id", table_name="chantiers")
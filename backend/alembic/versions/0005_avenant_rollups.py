@@ -0,0 +1,79 @@
+"""Per-chantier and per-company avenant rollups
+
+Tables are backfilled from the existing avenants; from then on
+app.rollups keeps them up to date.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2025-01-05 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+TOTALS = """
+    SUM(CASE WHEN a.type = 'FORFAIT' THEN a.total_ht ELSE 0 END),
+    SUM(CASE WHEN a.type = 'REGIE' THEN a.total_ht ELSE 0 END),
+    SUM(CASE WHEN a.type = 'FORFAIT' THEN 1 ELSE 0 END),
+    SUM(CASE WHEN a.type = 'REGIE' THEN 1 ELSE 0 END),
+    SUM(CASE WHEN a.status = 'DRAFT' THEN 1 ELSE 0 END),
+    SUM(CASE WHEN a.status = 'SIGNED' THEN 1 ELSE 0 END),
+    SUM(CASE WHEN a.status = 'SENT' THEN 1 ELSE 0 END),
+    CURRENT_TIMESTAMP
+"""
+COLUMNS = (
+    "forfait_total_ht, regie_total_ht, forfait_count, regie_count, "
+    "draft_count, signed_count, sent_count, updated_at"
+)
+
+
+def _rollup_columns():
+    return [
+        sa.Column("forfait_total_ht", sa.Numeric(), nullable=False),
+        sa.Column("regie_total_ht", sa.Numeric(), nullable=False),
+        sa.Column("forfait_count", sa.Integer(), nullable=False),
+        sa.Column("regie_count", sa.Integer(), nullable=False),
+        sa.Column("draft_count", sa.Integer(), nullable=False),
+        sa.Column("signed_count", sa.Integer(), nullable=False),
+        sa.Column("sent_count", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    ]
+
+
+def upgrade():
+    op.create_table(
+        "chantier_rollups",
+        sa.Column("chantier_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("chantiers.id"), primary_key=True),
+        sa.Column("company_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("companies.id"), nullable=False),
+        *_rollup_columns(),
+    )
+    op.create_table(
+        "company_rollups",
+        sa.Column("company_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("companies.id"), primary_key=True),
+        *_rollup_columns(),
+    )
+
+    op.execute(
+        f"INSERT INTO chantier_rollups (chantier_id, company_id, {COLUMNS}) "
+        f"SELECT a.chantier_id, c.company_id, {TOTALS} "
+        "FROM avenants a JOIN chantiers c ON a.chantier_id = c.id "
+        "GROUP BY a.chantier_id, c.company_id"
+    )
+    op.execute(
+        f"INSERT INTO company_rollups (company_id, {COLUMNS}) "
+        f"SELECT c.company_id, {TOTALS} "
+        "FROM avenants a JOIN chantiers c ON a.chantier_id = c.id "
+        "GROUP BY c.company_id"
+    )
+
+
+def downgrade():
+    op.drop_table("company_rollups")
+    op.drop_table("chantier_rollups")
@@ -0,0 +1,31 @@
+"""Stored avenant PDFs
+
+pdf_file_id points at the rendered PDF in the content-addressed store and
+pdf_input_hash identifies the inputs it was rendered from, so the PDF is
+only rendered again when they change.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2025-01-07 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("avenants") as batch_op:
+        batch_op.add_column(sa.Column("pdf_file_id", sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column("pdf_input_hash", sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("avenants") as batch_op:
+        batch_op.drop_column("pdf_input_hash")
+        batch_op.drop_column("pdf_file_id")
@@ -0,0 +1,28 @@
+"""Pending delivery recipients
+
+pending_recipients keeps, as a JSON list, the recipients a delivery job
+still has to email after a partial failure, so retries only send to them.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2025-01-08 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("avenant_deliveries") as batch_op:
+        batch_op.add_column(sa.Column("pending_recipients", sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("avenant_deliveries") as batch_op:
+        batch_op.drop_column("pending_recipients")
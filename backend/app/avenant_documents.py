@@ -0,0 +1,292 @@
+"""
+Stored avenant PDFs
+
+The PDF of an avenant is rendered once and kept in the content-addressed
+store (app.storage): avenants.pdf_file_id is the SHA-256 of the PDF bytes
+and avenants.pdf_input_hash the hash of everything it was rendered from
+(avenant fields, chantier, company name, photo and signature ids, PDF
+templates). ensure_avenant_pdf renders when the object is missing, whoever
+asks first: the delivery worker, a download or an export. The PDF of a
+signed avenant is the document the client signed, so it is frozen at its
+first render; only unsigned ones are rendered again when the hash changes.
+
+The ZIP export of a chantier is built in two steps. First,
+prepare_signed_avenants_export reads the avenants in keyset batches and
+ensures their PDFs with bounded parallelism, so render failures surface
+before any byte is sent. Then stream_avenants_zip streams every entry in
+chunks: only (name, date, file id) per avenant is kept in memory and no
+archive is written to disk.
+"""
+from datetime import datetime
+from functools import lru_cache
+from typing import AsyncIterator, List, Optional, Tuple
+from uuid import UUID, uuid4
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import zipfile
+
+from sqlalchemy import select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+from . import models, storage
+from .database import AsyncSessionLocal
+from .pdf_service import PDF_RENDER_WORKERS, render_avenant_pdf
+from .templating import TEMPLATES_DIR
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+PDF_TEMPLATES = ("avenant_pdf.html", "avenant_pdf.css")
+RENDER_DIR = "uploads"  # Same filesystem as the store, rendered files are moved into it
+
+# Export configuration from environment variables
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "20"))  # Avenants read and rendered together
+EXPORT_RENDER_CONCURRENCY = int(os.getenv("EXPORT_RENDER_CONCURRENCY", str(PDF_RENDER_WORKERS)))
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", str(64 * 1024)))  # Bytes read per PDF chunk
+
+EXPORTED_STATUSES = ("SIGNED", "SENT")
+FROZEN_STATUSES = ("SIGNED", "SENT")  # Later changes (company name, templates) do not touch their PDF
+
+
+@lru_cache(maxsize=1)
+def templates_digest() -> str:
+    """Hash of the PDF templates, a new layout invalidates every stored PDF."""
+    digest = hashlib.sha256()
+    for name in PDF_TEMPLATES:
+        digest.update((TEMPLATES_DIR / name).read_bytes())
+    return digest.hexdigest()
+
+
+def _optional_float(value) -> Optional[float]:
+    return float(value) if value else None
+
+
+def pdf_inputs(avenant: models.Avenant, chantier: models.Chantier, company_name: str) -> dict:
+    """Keyword arguments of generate_avenant_pdf for an avenant."""
+    return dict(
+        avenant_id=str(avenant.id),
+        chantier_name=chantier.name,
+        chantier_address=chantier.address,
+        description=avenant.description,
+        avenant_type=avenant.type,
+        total_ht=float(avenant.total_ht),
+        photo_path=storage.resolve_path(avenant.photo_url),
+        signature_path=storage.resolve_path(avenant.signature_url),
+        company_name=company_name,
+        created_at=avenant.created_at.strftime("%d/%m/%Y"),
+        price=_optional_float(avenant.price),
+        hours=_optional_float(avenant.hours),
+        hourly_rate=_optional_float(avenant.hourly_rate),
+    )
+
+
+def input_hash(avenant: models.Avenant, inputs: dict) -> str:
+    """Hash identifying the rendered PDF: same hash, same document."""
+    # Files by reference (content hash for stored ones), not by filesystem path
+    key = {
+        **inputs,
+        "photo_path": avenant.photo_url,
+        "signature_path": avenant.signature_url,
+        "templates": templates_digest(),
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+def _discard(path: str):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+async def ensure_avenant_pdf(
+    db: AsyncSession,
+    avenant: models.Avenant,
+    chantier: models.Chantier,
+    company_name: str,
+) -> str:
+    """
+    File id of the avenant's stored PDF, rendering it first if needed
+
+    Flushes but does not commit. Two concurrent calls may both render, only
+    the first one to record its result keeps a reference on the file and
+    the other one returns that file instead of its own. A new
+    file bumps avenants.updated_at, pdf_file_id is part of the avenant's
+    representation (ETags, Last-Modified).
+
+    Returns:
+        file_id of the PDF, its path is storage.object_path(file_id)
+    """
+    inputs = pdf_inputs(avenant, chantier, company_name)
+    digest = input_hash(avenant, inputs)
+    if avenant.pdf_file_id and await asyncio.to_thread(storage.exists, avenant.pdf_file_id):
+        if avenant.status in FROZEN_STATUSES or avenant.pdf_input_hash == digest:
+            return avenant.pdf_file_id
+    elif avenant.pdf_file_id:
+        logger.warning(
+            f"[PDF] Stored PDF {avenant.pdf_file_id} of avenant {avenant.id} is missing, rendering it again"
+        )
+
+    # Unique name: concurrent renders of the same avenant must not share a file
+    temp_path = os.path.join(RENDER_DIR, f"{avenant.id}.{uuid4().hex}.pdf")
+    try:
+        await render_avenant_pdf(**inputs, output_path=temp_path)
+        size = os.path.getsize(temp_path)
+        file_id = await asyncio.to_thread(storage.put_path, temp_path)
+    finally:
+        _discard(temp_path)
+    await storage.register_file(db, file_id, size, "application/pdf")
+
+    # Compare-and-set on the previous file
+    previous_file_id = avenant.pdf_file_id
+    updated_at = datetime.utcnow() if file_id != previous_file_id else avenant.updated_at
+    result = await db.execute(
+        update(models.Avenant)
+        .where(
+            models.Avenant.id == avenant.id,
+            models.Avenant.pdf_file_id.is_(None) if previous_file_id is None
+            else models.Avenant.pdf_file_id == previous_file_id,
+        )
+        .values(pdf_file_id=file_id, pdf_input_hash=digest, updated_at=updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 1:
+        if file_id != previous_file_id:
+            await storage.add_reference(db, file_id)
+            if previous_file_id:
+                await storage.release_reference(db, previous_file_id)
+        logger.info(f"[PDF] Stored PDF {file_id} for avenant {avenant.id}")
+    else:
+        # Another render recorded its file first: use that one, ours is
+        # unreferenced and left to the garbage collector
+        result = await db.execute(
+            select(models.Avenant.pdf_file_id, models.Avenant.pdf_input_hash, models.Avenant.updated_at)
+            .where(models.Avenant.id == avenant.id)
+        )
+        file_id, digest, updated_at = result.one()
+        logger.info(f"[PDF] Avenant {avenant.id} already got PDF {file_id} from a concurrent render")
+    set_committed_value(avenant, "pdf_file_id", file_id)
+    set_committed_value(avenant, "pdf_input_hash", digest)
+    set_committed_value(avenant, "updated_at", updated_at)
+    return file_id
+
+
+class _ZipSink:
+    """Write-only, non-seekable file for ZipFile: the response drains what it wrote."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def write(self, data) -> int:
+        self._buffer += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def export_entry_name(avenant: models.Avenant) -> str:
+    return f"avenant_{avenant.created_at:%Y-%m-%d}_{avenant.id}.pdf"
+
+
+def export_batch_statement(chantier_id: UUID, after: Optional[tuple]):
+    """Next batch of exported avenants, oldest first, after the (created_at, id) position."""
+    statement = select(models.Avenant).where(
+        models.Avenant.chantier_id == chantier_id,
+        models.Avenant.status.in_(EXPORTED_STATUSES),
+    )
+    if after:
+        statement = statement.where(tuple_(models.Avenant.created_at, models.Avenant.id) > after)
+    return statement.order_by(models.Avenant.created_at, models.Avenant.id).limit(EXPORT_BATCH_SIZE)
+
+
+async def _ensure_in_own_session(
+    semaphore: asyncio.Semaphore,
+    avenant: models.Avenant,
+    chantier: models.Chantier,
+    company_name: str,
+) -> str:
+    # A session per render: sessions cannot be shared between concurrent tasks
+    async with semaphore, AsyncSessionLocal() as db:
+        file_id = await ensure_avenant_pdf(db, avenant, chantier, company_name)
+        await db.commit()
+        return file_id
+
+
+def _read_chunk(f, size: int) -> bytes:
+    return f.read(size)
+
+
+async def prepare_signed_avenants_export(
+    db: AsyncSession, chantier: models.Chantier
+) -> List[Tuple[str, tuple, str]]:
+    """
+    Ensure the PDF of every signed avenant of a chantier before its export
+
+    Rendering happens here, before the response starts: a PDF that cannot
+    be rendered fails the request with an error status instead of cutting
+    a ZIP that was already being sent. Commits.
+
+    Raises:
+        PdfRenderError (or a subclass) when a PDF cannot be rendered
+
+    Returns:
+        (entry name, entry date_time, file_id) per avenant, oldest first
+    """
+    result = await db.execute(select(models.Company.name).where(models.Company.id == chantier.company_id))
+    company_name = result.scalar_one()
+
+    semaphore = asyncio.Semaphore(EXPORT_RENDER_CONCURRENCY)
+    entries = []
+    after = None
+    while True:
+        avenants = (await db.execute(export_batch_statement(chantier.id, after))).scalars().all()
+        if not avenants:
+            break
+        after = (avenants[-1].created_at, avenants[-1].id)
+
+        file_ids = await asyncio.gather(*(
+            _ensure_in_own_session(semaphore, avenant, chantier, company_name)
+            for avenant in avenants
+        ))
+        entries.extend(
+            (export_entry_name(avenant), avenant.created_at.timetuple()[:6], file_id)
+            for avenant, file_id in zip(avenants, file_ids)
+        )
+        # Keep the identity map (and memory) from growing with the export
+        db.expunge_all()
+        await db.commit()
+    return entries
+
+
+async def stream_avenants_zip(entries: List[Tuple[str, tuple, str]]) -> AsyncIterator[bytes]:
+    """
+    ZIP (stored, PDFs do not compress) of the stored PDFs listed in entries
+
+    entries comes from prepare_signed_avenants_export: the objects are
+    referenced by their avenants, nothing is rendered while streaming.
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as archive:
+        for name, date_time, file_id in entries:
+            path = storage.object_path(file_id)
+            entry = zipfile.ZipInfo(name, date_time)
+            entry.compress_type = zipfile.ZIP_STORED
+            entry.file_size = os.path.getsize(path)
+            with open(path, "rb") as f, archive.open(entry, mode="w") as zipped:
+                while chunk := await asyncio.to_thread(_read_chunk, f, EXPORT_CHUNK_SIZE):
+                    zipped.write(chunk)
+                    yield sink.drain()
+            # Data descriptor written when the entry is closed
+            yield sink.drain()
+    # Central directory, written when the archive is closed
+    yield sink.drain()
+
+    logger.info(f"[EXPORT] Streamed {len(entries)} avenant PDF(s)")
@@ -0,0 +1,91 @@
+"""
+Negotiated gzip/brotli compression of JSON responses
+
+JSON bodies larger than COMPRESSION_MIN_SIZE are compressed with the best
+encoding the client accepts: brotli when the optional `brotli` package is
+installed, gzip otherwise. Other responses (PDFs, images, ZIP downloads)
+are streamed through untouched. Bodies of COMPRESSION_THREAD_MIN_SIZE
+bytes or more are compressed in a worker thread, off the event loop.
+"""
+from typing import Optional
+import asyncio
+import gzip
+import os
+
+from fastapi import Request
+from starlette.datastructures import MutableHeaders
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:  # Optional dependency, gzip only without it
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))  # bytes
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))  # 11 is far too slow for dynamic bodies
+COMPRESSION_THREAD_MIN_SIZE = int(os.getenv("COMPRESSION_THREAD_MIN_SIZE", str(64 * 1024)))  # bytes
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Preferred supported encoding among those accepted (q > 0), or None."""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    supported = ["br", "gzip"] if brotli is not None else ["gzip"]
+    candidates = [
+        encoding for encoding in supported
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0
+    ]
+    if not candidates:
+        return None
+    # Highest q-value wins, server preference order on ties
+    return max(candidates, key=lambda encoding: accepted.get(encoding, accepted.get("*", 0.0)))
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+async def compress_response(request: Request, response: Response) -> Response:
+    """Compressed copy of a JSON response from call_next, or the response itself."""
+    if (
+        not response.headers.get("content-type", "").startswith("application/json")
+        or "content-encoding" in response.headers
+    ):
+        return response
+
+    encoding = choose_encoding(request.headers.get("accept-encoding"))
+    body = b"".join([chunk async for chunk in response.body_iterator])
+
+    # Raw copy: repeated headers (Set-Cookie) must all be kept
+    headers = MutableHeaders(raw=[
+        (name, value) for name, value in response.headers.raw if name != b"content-length"
+    ])
+    if len(body) >= COMPRESSION_MIN_SIZE:
+        # Caches must key on Accept-Encoding even when this client got identity
+        headers.add_vary_header("Accept-Encoding")
+        if encoding:
+            if len(body) >= COMPRESSION_THREAD_MIN_SIZE:
+                body = await asyncio.to_thread(compress, body, encoding)
+            else:
+                body = compress(body, encoding)
+            headers["content-encoding"] = encoding
+    headers["content-length"] = str(len(body))
+
+    compressed = Response(content=body, status_code=response.status_code, background=response.background)
+    compressed.raw_headers = headers.raw
+    return compressed
@@ -0,0 +1,305 @@
+"""
+Post-signature delivery pipeline for avenants
+
+create_avenant only records an AvenantDelivery row in the same transaction as
+the avenant. The in-process DeliveryWorker drains those rows: it stores the
+PDF (app.avenant_documents), emails it to every recipient and cleans up the
+temporary files, retrying failed jobs with exponential backoff.
+"""
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional
+from uuid import UUID
+
+from sqlalchemy import select, update
+
+from . import models, rollups, storage
+from .database import AsyncSessionLocal
+from .avenant_documents import ensure_avenant_pdf
+from .email import send_email_to_many
+from .templating import render_template
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Delivery configuration from environment variables
+DELIVERY_MAX_ATTEMPTS = int(os.getenv("DELIVERY_MAX_ATTEMPTS", "5"))
+DELIVERY_RETRY_DELAY = float(os.getenv("DELIVERY_RETRY_DELAY", "30"))  # Seconds, doubled on each attempt
+DELIVERY_POLL_INTERVAL = float(os.getenv("DELIVERY_POLL_INTERVAL", "15"))
+DELIVERY_LEASE_SECONDS = float(os.getenv("DELIVERY_LEASE_SECONDS", "300"))
+DELIVERY_BATCH_SIZE = int(os.getenv("DELIVERY_BATCH_SIZE", "10"))
+
+PENDING = "PENDING"
+RENDERED = "RENDERED"
+SENT = "SENT"
+FAILED = "FAILED"
+
+
+def build_avenant_email_html(chantier: models.Chantier, avenant: models.Avenant) -> str:
+    """Build the HTML body of the avenant notification email."""
+    return render_template(
+        "avenant_email.html",
+        chantier_name=chantier.name,
+        description=avenant.description,
+        avenant_type=avenant.type,
+        total_ht=float(avenant.total_ht),
+        avenant_id=str(avenant.id)
+    )
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _cleanup_files(paths: List[Optional[str]]):
+    """Delete temporary files (photo, signature, PDF)."""
+    for file_path in paths:
+        if not file_path or not os.path.exists(file_path):
+            continue
+        try:
+            os.remove(file_path)
+            print(f"[CLEANUP] Deleted temporary file: {file_path}")
+        except Exception as e:
+            print(f"[WARNING] Could not delete {file_path}: {e}")
+
+
+def owner_emails_statement(company_id: UUID):
+    return select(models.UserProfile.email).where(
+        models.UserProfile.company_id == company_id,
+        models.UserProfile.role == "OWNER"
+    )
+
+
+def due_jobs_statement(batch_size: int):
+    """Ids of the delivery jobs due now, oldest first."""
+    return (
+        select(models.AvenantDelivery.id)
+        .where(
+            models.AvenantDelivery.status.in_([PENDING, RENDERED]),
+            models.AvenantDelivery.next_attempt_at <= datetime.utcnow(),
+        )
+        .order_by(models.AvenantDelivery.created_at)
+        .limit(batch_size)
+    )
+
+
+async def _get_recipients(db, chantier: models.Chantier, avenant: models.Avenant) -> List[str]:
+    """
+    Get all emails to send to:
+    1. Client email (from chantier)
+    2. Employee email (user who created the avenant)
+    3. All company owners emails
+    """
+    recipients = [chantier.email]
+
+    if avenant.employee_id:
+        result = await db.execute(
+            select(models.UserProfile.email).where(models.UserProfile.id == avenant.employee_id)
+        )
+        employee_email = result.scalar()
+        if employee_email and employee_email not in recipients:
+            recipients.append(employee_email)
+
+    owners_result = await db.execute(owner_emails_statement(chantier.company_id))
+    for owner_email in owners_result.scalars().all():
+        if owner_email not in recipients:
+            recipients.append(owner_email)
+
+    return recipients
+
+
+async def _render(
+    db,
+    delivery: models.AvenantDelivery,
+    avenant: models.Avenant,
+    chantier: models.Chantier,
+    company_name: str,
+) -> str:
+    """Make sure the avenant PDF is stored and record it on the delivery."""
+    file_id = await ensure_avenant_pdf(db, avenant, chantier, company_name)
+
+    delivery.pdf_path = storage.object_path(file_id)
+    delivery.status = RENDERED
+    await db.commit()
+    return delivery.pdf_path
+
+
+async def _send(db, delivery: models.AvenantDelivery, avenant: models.Avenant, chantier: models.Chantier):
+    """
+    Email the rendered PDF to every recipient still waiting for it.
+
+    Recipients that could not be emailed are kept on the job and the attempt
+    fails, so the retry only sends to them. Once attempts are exhausted the
+    job is SENT if anyone got the email, with the others in last_error.
+    """
+    all_recipients = await _get_recipients(db, chantier, avenant)
+    recipients = all_recipients
+    if delivery.pending_recipients is not None:
+        recipients = json.loads(delivery.pending_recipients)
+    pdf_data = await asyncio.to_thread(_read_file, delivery.pdf_path)
+    html_content = build_avenant_email_html(chantier, avenant)
+
+    results = await send_email_to_many(
+        recipients=recipients,
+        subject=f"Avenant - {chantier.name}",
+        html_content=html_content,
+        attachments=[(f"avenant_{str(avenant.id)}.pdf", pdf_data, "application/pdf")]
+    )
+
+    failures = {recipient: error for recipient, error in results.items() if error}
+    if failures:
+        if len(failures) == len(all_recipients) or delivery.attempts < DELIVERY_MAX_ATTEMPTS:
+            # Committed before failing the attempt so the rollback keeps it
+            delivery.pending_recipients = json.dumps(list(failures))
+            await db.commit()
+            raise RuntimeError(f"Email not sent to: {failures}")
+        logger.error(f"[DELIVERY] Avenant {avenant.id} never emailed to: {list(failures)}")
+
+    delivery.status = SENT
+    delivery.pending_recipients = None
+    delivery.last_error = f"Email not sent to: {failures}" if failures else None
+    previous_status = avenant.status
+    avenant.status = "SENT"
+    await rollups.record_status_change(db, avenant, chantier.company_id, previous_status, avenant.status)
+    await db.commit()
+
+
+async def process_delivery(delivery_id: UUID) -> bool:
+    """
+    Claim and run one delivery job.
+
+    Returns:
+        False if another worker claimed the job first, True otherwise
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(models.AvenantDelivery).where(models.AvenantDelivery.id == delivery_id)
+        )
+        delivery = result.scalars().first()
+        if not delivery or delivery.status not in (PENDING, RENDERED):
+            return False
+
+        # Claim the job with a lease so concurrent workers skip it
+        now = datetime.utcnow()
+        claimed = await db.execute(
+            update(models.AvenantDelivery)
+            .where(
+                models.AvenantDelivery.id == delivery.id,
+                models.AvenantDelivery.attempts == delivery.attempts,
+                models.AvenantDelivery.next_attempt_at <= now,
+            )
+            .values(
+                attempts=delivery.attempts + 1,
+                next_attempt_at=now + timedelta(seconds=DELIVERY_LEASE_SECONDS),
+            )
+        )
+        await db.commit()
+        if claimed.rowcount != 1:
+            return False
+        await db.refresh(delivery)
+
+        try:
+            result = await db.execute(
+                select(models.Avenant, models.Chantier, models.Company.name)
+                .join(models.Chantier, models.Avenant.chantier_id == models.Chantier.id)
+                .join(models.Company, models.Chantier.company_id == models.Company.id)
+                .where(models.Avenant.id == delivery.avenant_id)
+            )
+            avenant, chantier, company_name = result.one()
+
+            # Renders only if the stored PDF is missing or out of date
+            await _render(db, delivery, avenant, chantier, company_name)
+            await _send(db, delivery, avenant, chantier)
+
+            # The stored PDF, photo and signature belong to the avenant, only legacy uploads are temporary
+            _cleanup_files([
+                ref for ref in (avenant.photo_url, avenant.signature_url) if not storage.is_file_id(ref)
+            ])
+            logger.info(f"[DELIVERY] Avenant {avenant.id} delivered after {delivery.attempts} attempt(s)")
+        except Exception as e:
+            await db.rollback()
+            await db.refresh(delivery)
+            delivery.last_error = str(e) or e.__class__.__name__
+            if delivery.attempts >= DELIVERY_MAX_ATTEMPTS:
+                delivery.status = FAILED
+                logger.error(f"[DELIVERY] Giving up on avenant {delivery.avenant_id}: {e}")
+            else:
+                delay = DELIVERY_RETRY_DELAY * 2 ** (delivery.attempts - 1)
+                delivery.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+                logger.warning(
+                    f"[DELIVERY] Attempt {delivery.attempts} for avenant {delivery.avenant_id} failed, "
+                    f"retrying in {delay:.0f}s: {e}"
+                )
+            await db.commit()
+
+        return True
+
+
+class DeliveryWorker:
+    """
+    Background task draining due delivery jobs.
+
+    It wakes up when notify() is called after a commit, and polls every
+    DELIVERY_POLL_INTERVAL seconds to pick up retries and jobs left over
+    from a previous run.
+    """
+
+    def __init__(self, poll_interval: float = DELIVERY_POLL_INTERVAL, batch_size: int = DELIVERY_BATCH_SIZE):
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info("[DELIVERY] Worker started")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("[DELIVERY] Worker stopped")
+
+    def notify(self):
+        """Wake the worker up, e.g. right after a new job is committed."""
+        self._wakeup.set()
+
+    async def process_due_jobs(self) -> int:
+        """Run every job that is due, returns how many were processed."""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(due_jobs_statement(self.batch_size))
+            delivery_ids = result.scalars().all()
+
+        processed = 0
+        for delivery_id in delivery_ids:
+            if await process_delivery(delivery_id):
+                processed += 1
+        return processed
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                if await self.process_due_jobs():
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("[DELIVERY] Error while processing delivery jobs")
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+delivery_worker = DeliveryWorker()
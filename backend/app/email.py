@@ -1,14 +1,15 @@
-import aiosmtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.image import MIMEImage
 from email.mime.application import MIMEApplication
-from jinja2 import Template
 import os
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional
+import asyncio
 import base64
 import logging
+from .smtp_pool import SMTPConnectionPool
+from .templating import render_template
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -20,12 +21,70 @@ SMTP_USERNAME = os.getenv("SMTP_USERNAME", "")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
 SMTP_FROM_EMAIL = os.getenv("SMTP_FROM_EMAIL", "")
 SMTP_FROM_NAME = os.getenv("SMTP_FROM_NAME", "ChantierPlus")
+SMTP_START_TLS = os.getenv("SMTP_START_TLS", "true").lower() == "true"
+SMTP_USE_TLS = os.getenv("SMTP_USE_TLS", "false").lower() == "true"
+SMTP_POOL_MIN_SIZE = int(os.getenv("SMTP_POOL_MIN_SIZE", "0"))
+SMTP_POOL_MAX_SIZE = int(os.getenv("SMTP_POOL_MAX_SIZE", "4"))
+SMTP_POOL_IDLE_TIMEOUT = float(os.getenv("SMTP_POOL_IDLE_TIMEOUT", "60"))
+EMAIL_FANOUT_MODE = os.getenv("EMAIL_FANOUT_MODE", "concurrent")  # concurrent, single
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:5173")
 
 # Log SMTP configuration (without password)
 logger.info(f"SMTP Configuration: Host={SMTP_HOST}, Port={SMTP_PORT}, Username={SMTP_USERNAME}, From={SMTP_FROM_EMAIL}")
 print(f"[CONFIG] SMTP Configuration loaded: {SMTP_HOST}:{SMTP_PORT} from {SMTP_FROM_EMAIL}")
 
+# Shared pool of authenticated SMTP connections used by every send
+smtp_pool = SMTPConnectionPool(
+    hostname=SMTP_HOST,
+    port=SMTP_PORT,
+    username=SMTP_USERNAME,
+    password=SMTP_PASSWORD,
+    start_tls=SMTP_START_TLS,
+    use_tls=SMTP_USE_TLS,
+    min_size=SMTP_POOL_MIN_SIZE,
+    max_size=SMTP_POOL_MAX_SIZE,
+    idle_timeout=SMTP_POOL_IDLE_TIMEOUT,
+)
+
+
+def build_message_parts(
+    html_content: str,
+    attachments: Optional[List[tuple[str, bytes, str]]] = None
+) -> list:
+    """
+    Build the MIME parts of an email (HTML body and attachments).
+
+    Attachments are base64-encoded here, so the returned parts can be shared
+    by every message of a fan-out without being encoded again.
+    """
+    parts = [MIMEText(html_content, "html")]
+
+    if attachments:
+        for filename, file_data, mime_type in attachments:
+            if mime_type.startswith("image/"):
+                attachment = MIMEImage(file_data)
+            elif mime_type == "application/pdf":
+                attachment = MIMEApplication(file_data, _subtype="pdf")
+            else:
+                attachment = MIMEApplication(file_data)
+            attachment.add_header("Content-Disposition", f"attachment; filename={filename}")
+            parts.append(attachment)
+
+    return parts
+
+
+def build_message(to_email: str, subject: str, parts: list) -> MIMEMultipart:
+    """Wrap prebuilt parts in a message addressed to `to_email`."""
+    message = MIMEMultipart()
+    message["From"] = f"{SMTP_FROM_NAME} <{SMTP_FROM_EMAIL}>"
+    message["To"] = to_email
+    message["Subject"] = subject
+
+    for part in parts:
+        message.attach(part)
+
+    return message
+
 
 async def send_email(
     to_email: str,
@@ -42,41 +101,14 @@ async def send_email(
         html_content: HTML content of the email
         attachments: List of tuples (filename, file_data, mime_type)
     """
-    message = MIMEMultipart()
-    message["From"] = f"{SMTP_FROM_NAME} <{SMTP_FROM_EMAIL}>"
-    message["To"] = to_email
-    message["Subject"] = subject
-
-    # Add HTML content
-    message.attach(MIMEText(html_content, "html"))
-
-    # Add attachments if any
-    if attachments:
-        for filename, file_data, mime_type in attachments:
-            if mime_type.startswith("image/"):
-                attachment = MIMEImage(file_data)
-                attachment.add_header("Content-Disposition", f"attachment; filename={filename}")
-            elif mime_type == "application/pdf":
-                attachment = MIMEApplication(file_data, _subtype="pdf")
-                attachment.add_header("Content-Disposition", f"attachment; filename={filename}")
-            else:
-                attachment = MIMEApplication(file_data)
-                attachment.add_header("Content-Disposition", f"attachment; filename={filename}")
-            message.attach(attachment)
+    message = build_message(to_email, subject, build_message_parts(html_content, attachments))
 
     # Send email
     try:
         logger.info(f"[EMAIL] Sending email to {to_email} via {SMTP_HOST}:{SMTP_PORT}")
         print(f"[EMAIL] Attempting to send email to {to_email}...")
 
-        await aiosmtplib.send(
-            message,
-            hostname=SMTP_HOST,
-            port=SMTP_PORT,
-            username=SMTP_USERNAME,
-            password=SMTP_PASSWORD,
-            start_tls=True,
-        )
+        await smtp_pool.send_message(message)
 
         logger.info(f"[SUCCESS] Email sent successfully to {to_email}")
         print(f"[SUCCESS] Email sent successfully to {to_email}")
@@ -88,93 +120,79 @@ async def send_email(
         raise
 
 
+async def send_email_to_many(
+    recipients: List[str],
+    subject: str,
+    html_content: str,
+    attachments: Optional[List[tuple[str, bytes, str]]] = None,
+    single_transaction: Optional[bool] = None,
+    max_concurrency: int = SMTP_POOL_MAX_SIZE,
+) -> Dict[str, Optional[str]]:
+    """
+    Send the same email to several recipients, encoding it only once
+
+    Args:
+        recipients: Recipient email addresses
+        subject: Email subject
+        html_content: HTML content of the email
+        attachments: List of tuples (filename, file_data, mime_type)
+        single_transaction: Send one message with every recipient in a single
+            SMTP transaction (multiple RCPT TO) instead of one message per
+            recipient sent concurrently. Recipients are then only in the
+            envelope, like Bcc: the client and the company's staff never see
+            each other's addresses. Defaults to EMAIL_FANOUT_MODE.
+        max_concurrency: Maximum number of messages in flight at once
+
+    Returns:
+        Dict mapping each recipient to None on success or an error message
+    """
+    if single_transaction is None:
+        single_transaction = EMAIL_FANOUT_MODE == "single"
+
+    parts = build_message_parts(html_content, attachments)
+    results: Dict[str, Optional[str]] = {}
+
+    if single_transaction:
+        # Neutral To header, the real recipients are the RCPT TO of the envelope
+        message = build_message(f"{SMTP_FROM_NAME} <{SMTP_FROM_EMAIL}>", subject, parts)
+        logger.info(f"[EMAIL] Sending one email to {len(recipients)} recipients via {SMTP_HOST}:{SMTP_PORT}")
+        try:
+            refused, _ = await smtp_pool.send_message(message, recipients=recipients)
+        except Exception as e:
+            logger.error(f"[ERROR] Error sending email to {', '.join(recipients)}: {e}")
+            return {recipient: str(e) for recipient in recipients}
+        for recipient in recipients:
+            error = refused.get(recipient)
+            results[recipient] = str(error) if error else None
+    else:
+        slots = asyncio.Semaphore(max(max_concurrency, 1))
+
+        async def send_one(recipient: str):
+            async with slots:
+                try:
+                    await smtp_pool.send_message(build_message(recipient, subject, parts))
+                    results[recipient] = None
+                except Exception as e:
+                    logger.error(f"[ERROR] Error sending email to {recipient}: {e}")
+                    results[recipient] = str(e) or e.__class__.__name__
+
+        logger.info(f"[EMAIL] Sending email to {len(recipients)} recipients via {SMTP_HOST}:{SMTP_PORT}")
+        await asyncio.gather(*(send_one(recipient) for recipient in recipients))
+
+    sent = sum(1 for error in results.values() if error is None)
+    logger.info(f"[SUCCESS] Email sent to {sent}/{len(recipients)} recipients")
+    print(f"[SUCCESS] Email sent to {sent}/{len(recipients)} recipients")
+    return results
+
+
 async def send_invitation_email(email: str, token: str, company_name: str):
     """
     Send an invitation email to a new employee.
     """
     invitation_link = f"{FRONTEND_URL}/activate?token={token}"
 
-    html_template = """
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <style>
-            body {
-                font-family: Arial, sans-serif;
-                line-height: 1.6;
-                color: #333;
-                max-width: 600px;
-                margin: 0 auto;
-                padding: 20px;
-            }
-            .header {
-                background-color: #f59e0b;
-                color: white;
-                padding: 20px;
-                text-align: center;
-                border-radius: 5px 5px 0 0;
-            }
-            .content {
-                background-color: #f9fafb;
-                padding: 30px;
-                border: 1px solid #e5e7eb;
-            }
-            .button {
-                display: inline-block;
-                padding: 12px 24px;
-                background-color: #f59e0b;
-                color: white;
-                text-decoration: none;
-                border-radius: 5px;
-                margin: 20px 0;
-            }
-            .footer {
-                text-align: center;
-                margin-top: 30px;
-                padding-top: 20px;
-                border-top: 1px solid #e5e7eb;
-                color: #6b7280;
-                font-size: 14px;
-            }
-        </style>
-    </head>
-    <body>
-        <div class="header">
-            <h1>Invitation à rejoindre {{ company_name }}</h1>
-        </div>
-
-        <div class="content">
-            <p>Bonjour,</p>
-            <p>Vous avez été invité à rejoindre <strong>{{ company_name }}</strong> sur ChantierPlus.</p>
-            <p>Cliquez sur le bouton ci-dessous pour créer votre compte :</p>
-
-            <p style="text-align: center;">
-                <a href="{{ invitation_link }}" class="button">
-                    Activer mon compte
-                </a>
-            </p>
-
-            <p style="color: #6b7280; font-size: 14px;">
-                Ce lien expirera dans 7 jours.
-            </p>
-
-            <p style="color: #6b7280; font-size: 14px;">
-                Si vous ne pouvez pas cliquer sur le bouton, copiez et collez ce lien dans votre navigateur :
-                <br>
-                <a href="{{ invitation_link }}">{{ invitation_link }}</a>
-            </p>
-        </div>
-
-        <div class="footer">
-            <p>Cet email a été envoyé par ChantierPlus.</p>
-        </div>
-    </body>
-    </html>
-    """
-
-    template = Template(html_template)
-    html_content = template.render(
+    html_content = render_template(
+        "invitation_email.html",
         company_name=company_name,
         invitation_link=invitation_link
     )
@@ -193,97 +211,7 @@ async def send_password_reset_email(email: str, token: str):
     """
     reset_link = f"{FRONTEND_URL}/reset-password?token={token}"
 
-    html_template = """
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <style>
-            body {
-                font-family: Arial, sans-serif;
-                line-height: 1.6;
-                color: #333;
-                max-width: 600px;
-                margin: 0 auto;
-                padding: 20px;
-            }
-            .header {
-                background-color: #f59e0b;
-                color: white;
-                padding: 20px;
-                text-align: center;
-                border-radius: 5px 5px 0 0;
-            }
-            .content {
-                background-color: #f9fafb;
-                padding: 30px;
-                border: 1px solid #e5e7eb;
-            }
-            .button {
-                display: inline-block;
-                padding: 12px 24px;
-                background-color: #f59e0b;
-                color: white;
-                text-decoration: none;
-                border-radius: 5px;
-                margin: 20px 0;
-            }
-            .footer {
-                text-align: center;
-                margin-top: 30px;
-                padding-top: 20px;
-                border-top: 1px solid #e5e7eb;
-                color: #6b7280;
-                font-size: 14px;
-            }
-            .warning {
-                background-color: #fef3c7;
-                border-left: 4px solid #f59e0b;
-                padding: 15px;
-                margin: 20px 0;
-            }
-        </style>
-    </head>
-    <body>
-        <div class="header">
-            <h1>Réinitialisation de mot de passe</h1>
-        </div>
-
-        <div class="content">
-            <p>Bonjour,</p>
-            <p>Vous avez demandé une réinitialisation de votre mot de passe sur ChantierPlus.</p>
-            <p>Cliquez sur le bouton ci-dessous pour définir un nouveau mot de passe :</p>
-
-            <p style="text-align: center;">
-                <a href="{{ reset_link }}" class="button">
-                    Réinitialiser mon mot de passe
-                </a>
-            </p>
-
-            <div class="warning">
-                <strong>⚠️ Important :</strong> Ce lien expirera dans 1 heure.
-            </div>
-
-            <p style="color: #6b7280; font-size: 14px;">
-                Si vous n'avez pas fait cette demande, ignorez cet email. Votre mot de passe restera inchangé.
-            </p>
-
-            <p style="color: #6b7280; font-size: 14px;">
-                Si vous ne pouvez pas cliquer sur le bouton, copiez et collez ce lien dans votre navigateur :
-                <br>
-                <a href="{{ reset_link }}">{{ reset_link }}</a>
-            </p>
-        </div>
-
-        <div class="footer">
-            <p>Cet email a été envoyé par ChantierPlus.</p>
-        </div>
-    </body>
-    </html>
-    """
-
-    template = Template(html_template)
-    html_content = template.render(reset_link=reset_link)
+    html_content = render_template("password_reset_email.html", reset_link=reset_link)
 
     subject = "Réinitialisation de votre mot de passe ChantierPlus"
 
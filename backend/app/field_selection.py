@@ -0,0 +1,42 @@
+"""
+Sparse fieldsets for list endpoints (?fields=)
+
+A listing returns every field of its schema by default. `fields=compact`
+selects the compact list schema, and `fields=id,type,total_ht` any subset
+of the full schema's fields. Only the matching columns are selected, so a
+list screen that does not show long texts (avenant descriptions) neither
+reads nor ships them.
+"""
+from typing import Optional, Tuple, Type
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+
+COMPACT = "compact"
+# Always selected: keyset cursors need created_at and id, ETags updated_at
+BOOKKEEPING_COLUMNS = ("id", "created_at", "updated_at")
+
+
+def requested_fields(
+    schema: Type[BaseModel], compact_schema: Type[BaseModel], fields: Optional[str]
+) -> Tuple[str, ...]:
+    """Names of the fields to return, in schema order, 400 on unknown ones."""
+    if not fields:
+        return tuple(schema.model_fields)
+    if fields == COMPACT:
+        return tuple(compact_schema.model_fields)
+
+    names = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = names - set(schema.model_fields)
+    if unknown or not names:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown field(s): {', '.join(sorted(unknown)) or fields}"
+        )
+    return tuple(name for name in schema.model_fields if name in names)
+
+
+def list_columns(model, fields: Tuple[str, ...]) -> list:
+    """Columns of model to select for fields, plus the bookkeeping ones."""
+    names = list(fields) + [name for name in BOOKKEEPING_COLUMNS if name not in fields]
+    return [getattr(model, name) for name in names]
@@ -0,0 +1,83 @@
+"""
+Conditional GET helpers (ETag / Last-Modified) and Cache-Control policies
+
+Read endpoints compute a weak ETag from the updated_at of the rows they
+return, before serializing anything. When the client already has that
+version (If-None-Match, or If-Modified-Since without an ETag) they answer
+304 with an empty body; otherwise the validators are added to the normal
+response.
+"""
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+import hashlib
+
+from fastapi import Request, Response
+
+# Cache-Control per kind of resource. Bodies depend on the bearer token,
+# so they are private to the browser and vary on Authorization.
+NO_CACHE = "private, no-cache"  # Always revalidate, cheap thanks to 304
+SHORT_CACHE = "private, max-age=60, must-revalidate"  # Rarely changes (company info)
+IMMUTABLE = "private, max-age=31536000, immutable"  # Content-addressed URLs (?v=<digest>)
+
+
+def weak_etag(*parts) -> str:
+    """Weak ETag identifying the given version parts (ids, timestamps, ...)."""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # Weak comparison: W/"x" and "x" match
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+def _not_modified_since(if_modified_since: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified.replace(microsecond=0) <= since
+
+
+def conditional_response(
+    request: Request,
+    response: Response,
+    etag: str,
+    cache_control: str = NO_CACHE,
+    last_modified: Optional[datetime] = None,
+) -> Optional[Response]:
+    """
+    Handle a conditional GET
+
+    Returns:
+        A 304 response to return as is when the client's copy is current,
+        None otherwise (the validators are then set on response)
+    """
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Authorization"}
+    if last_modified is not None:
+        # Timestamps are stored as naive UTC
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        not_modified = _etag_matches(if_none_match, etag)
+    else:
+        if_modified_since = request.headers.get("if-modified-since")
+        not_modified = bool(
+            if_modified_since and last_modified and _not_modified_since(if_modified_since, last_modified)
+        )
+
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
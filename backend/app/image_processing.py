@@ -0,0 +1,82 @@
+"""
+Image normalization for avenant photos using Pillow
+
+Phone photos are uploaded at full camera resolution, often rotated through
+EXIF only. They are normalized once at upload time: orientation applied,
+downscaled to what the PDF photo box can show at PHOTO_TARGET_DPI and
+re-encoded as a quality-bounded JPEG.
+"""
+from PIL import Image, ImageOps, UnidentifiedImageError
+from typing import Tuple
+import mimetypes
+import os
+
+PHOTO_TARGET_DPI = int(os.getenv("PHOTO_TARGET_DPI", "150"))
+PHOTO_JPEG_QUALITY = int(os.getenv("PHOTO_JPEG_QUALITY", "80"))
+
+# Size of the .photo box in avenant_pdf.css: full A4 content width
+# (21cm minus two 2cm margins) and max-height 400px (CSS px are 1/96 in)
+PHOTO_BOX_WIDTH_IN = 17 / 2.54
+PHOTO_BOX_HEIGHT_IN = 400 / 96
+
+
+class InvalidImageError(Exception):
+    """Raised when an uploaded file cannot be decoded as an image."""
+
+
+def photo_max_size(dpi: int = PHOTO_TARGET_DPI) -> Tuple[int, int]:
+    """Largest useful photo size in pixels for the PDF photo box."""
+    return round(PHOTO_BOX_WIDTH_IN * dpi), round(PHOTO_BOX_HEIGHT_IN * dpi)
+
+
+def normalize_photo(
+    source_path: str,
+    dest_path: str,
+    dpi: int = PHOTO_TARGET_DPI,
+    quality: int = PHOTO_JPEG_QUALITY,
+) -> str:
+    """
+    Normalize a photo for PDF embedding and write it as JPEG to dest_path
+
+    Returns:
+        MIME type of the written file
+    """
+    max_size = photo_max_size(dpi)
+    try:
+        with Image.open(source_path) as image:
+            # Let the JPEG decoder skip detail we would throw away anyway.
+            # Orientation is not applied yet, so ask for the longest side both ways.
+            longest = max(max_size)
+            image.draft("RGB", (longest, longest))
+
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail(max_size, Image.Resampling.LANCZOS)
+
+            if image.mode not in ("RGB", "L"):
+                # Flatten transparency on white, like the PDF background
+                rgba = image.convert("RGBA")
+                image = Image.new("RGB", rgba.size, "white")
+                image.paste(rgba, mask=rgba.getchannel("A"))
+
+            image.save(dest_path, "JPEG", quality=quality, optimize=True, progressive=True)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise InvalidImageError(str(e)) from e
+
+    return "image/jpeg"
+
+
+def guess_image_mime_type(path: str, default: str = "image/jpeg") -> str:
+    """MIME type of an image file from its extension."""
+    mime_type, _ = mimetypes.guess_type(path)
+    return mime_type if mime_type and mime_type.startswith("image/") else default
+
+
+def validate_png(path: str):
+    """Check that a file is a well-formed PNG, raise InvalidImageError otherwise."""
+    try:
+        with Image.open(path) as image:
+            if image.format != "PNG":
+                raise InvalidImageError(f"Expected a PNG image, got {image.format}")
+            image.verify()
+    except (UnidentifiedImageError, OSError, SyntaxError, Image.DecompressionBombError) as e:
+        raise InvalidImageError(str(e)) from e
@@ -1,7 +1,16 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from .routers import auth, chantiers, avenants, transcribe, company
-from .database import engine, Base
+from .database import engine
+from .migrations import run_migrations
+from .pdf_service import pdf_render_service
+from .delivery import delivery_worker
+from .email import smtp_pool
+from .templating import precompile_templates
+from .compression import compress_response
+from .responses import ORJSONResponse
+from .uploads import UploadLimitMiddleware
+from . import sql_stats
 from . import models  # Import models to register them with SQLAlchemy
 from dotenv import load_dotenv
 import os
@@ -9,7 +18,10 @@ import os
 # Load environment variables from .env file
 load_dotenv()
 
-app = FastAPI(title="ChantierPlus API")
+app = FastAPI(title="ChantierPlus API", default_response_class=ORJSONResponse)
+
+# Added before CORS so that its 413 responses still get the CORS headers
+app.add_middleware(UploadLimitMiddleware, limits=avenants.UPLOAD_BODY_LIMITS)
 
 # CORS
 origins = [
@@ -27,6 +39,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def collect_sql_stats(request: Request, call_next):
+    stats = sql_stats.start_request()
+    response = await call_next(request)
+    sql_stats.logger.debug(
+        f"[SQL] {request.method} {request.url.path}: {stats.header_value()}"
+    )
+    if sql_stats.SQL_STATS_HEADER:
+        response.headers["X-SQL-Stats"] = stats.header_value()
+    return response
+
+# Registered last so it wraps the other middlewares and sees the final body
+@app.middleware("http")
+async def compress_json(request: Request, call_next):
+    response = await call_next(request)
+    return await compress_response(request, response)
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(company.router)
@@ -37,7 +66,19 @@ app.include_router(transcribe.router)
 @app.on_event("startup")
 async def startup():
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(run_migrations)
+    precompile_templates()
+    pdf_render_service.start()
+    await smtp_pool.start()
+    delivery_worker.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await delivery_worker.stop()
+    await smtp_pool.close()
+    pdf_render_service.shutdown()
+    # Close pooled PostgreSQL connections instead of dropping them at exit
+    await engine.dispose()
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,58 @@
+"""
+Schema migrations with Alembic
+
+The schema is owned by the migration chain in backend/alembic/versions
+rather than Base.metadata.create_all, so indexes and column changes reach
+existing databases too. run_migrations upgrades to head at startup;
+`alembic upgrade head` from the backend folder does the same by hand.
+On PostgreSQL both hold an advisory lock, so the uvicorn workers starting
+together migrate one after the other instead of racing.
+"""
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect, text
+
+ALEMBIC_INI = Path(__file__).resolve().parent.parent / "alembic.ini"
+
+# Revision matching the schema created by create_all before migrations existed
+BASELINE_REVISION = "0001"
+
+# Arbitrary application-wide key of the PostgreSQL advisory lock
+MIGRATIONS_LOCK_ID = 7315042001
+
+
+def get_config(connection=None) -> Config:
+    config = Config(str(ALEMBIC_INI))
+    if connection is not None:
+        config.attributes["connection"] = connection
+    return config
+
+
+def lock_migrations(connection):
+    """
+    Wait for other processes migrating the same database (PostgreSQL only).
+
+    The lock is released when the connection's transaction ends, so the next
+    process only reads the schema once the previous upgrade is committed.
+    """
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATIONS_LOCK_ID})
+
+
+def run_migrations(connection):
+    """
+    Upgrade the database to the latest revision (sync, use with run_sync)
+
+    Databases created by create_all have tables but no alembic_version:
+    they are stamped with the baseline first, later revisions skip what
+    already exists.
+    """
+    lock_migrations(connection)
+    config = get_config(connection)
+    tables = inspect(connection).get_table_names()
+    if "alembic_version" not in tables and "avenants" in tables:
+        print(f"[MIGRATIONS] Existing database without version, stamping {BASELINE_REVISION}")
+        command.stamp(config, BASELINE_REVISION)
+    command.upgrade(config, "head")
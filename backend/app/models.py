@@ -1,7 +1,8 @@
-from sqlalchemy import Column, String, Boolean, ForeignKey, DateTime, Text, Numeric, func
+from sqlalchemy import Column, String, Boolean, ForeignKey, DateTime, Text, Numeric, Integer, Index, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import uuid
+from datetime import datetime
 from .database import Base
 
 class Company(Base):
@@ -10,12 +11,16 @@ class Company(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(Text, unique=True, nullable=False)
     created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Weak ETags of read endpoints
 
     users = relationship("UserProfile", back_populates="company")
     chantiers = relationship("Chantier", back_populates="company")
 
 class UserProfile(Base):
     __tablename__ = "user_profiles"
+    __table_args__ = (
+        Index("ix_user_profiles_company_id_role", "company_id", "role"),  # Owner lookups
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     company_id = Column(UUID(as_uuid=True), ForeignKey("companies.id"), nullable=False)
@@ -26,25 +31,34 @@ class UserProfile(Base):
     invitation_token = Column(Text, nullable=True, unique=True)  # For employee invitations
     reset_token = Column(Text, nullable=True, unique=True)  # For password reset
     token_expires_at = Column(DateTime, nullable=True)  # Expiration for tokens
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")  # Bumped to revoke issued access tokens
     created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Weak ETags of read endpoints
 
     company = relationship("Company", back_populates="users")
 
 class Chantier(Base):
     __tablename__ = "chantiers"
+    __table_args__ = (
+        Index("ix_chantiers_company_id_created_at_id", "company_id", "created_at", "id"),  # Keyset pagination
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     company_id = Column(UUID(as_uuid=True), ForeignKey("companies.id"), nullable=False)
     name = Column(Text, nullable=False)
     address = Column(Text, nullable=False)
     email = Column(Text, nullable=False)
-    created_at = Column(DateTime, default=func.now())
+    created_at = Column(DateTime, default=datetime.utcnow)  # Microseconds, pagination cursors compare on it
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Weak ETags of read endpoints
 
     company = relationship("Company", back_populates="chantiers")
     avenants = relationship("Avenant", back_populates="chantier")
 
 class Avenant(Base):
     __tablename__ = "avenants"
+    __table_args__ = (
+        Index("ix_avenants_chantier_id_created_at_id", "chantier_id", "created_at", "id"),  # Keyset pagination
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     chantier_id = Column(UUID(as_uuid=True), ForeignKey("chantiers.id"), nullable=False)
@@ -59,7 +73,69 @@ class Avenant(Base):
     signed_at = Column(DateTime, nullable=True)
     employee_id = Column(UUID(as_uuid=True), ForeignKey("user_profiles.id"), nullable=True)  # Employee who created the avenant
     status = Column(String, default="DRAFT") # DRAFT, SIGNED, SENT
-    created_at = Column(DateTime, default=func.now())
+    pdf_file_id = Column(String(64), nullable=True)  # Stored PDF, see app.avenant_documents
+    pdf_input_hash = Column(String(64), nullable=True)  # Hash of the inputs pdf_file_id was rendered from
+    created_at = Column(DateTime, default=datetime.utcnow)  # Microseconds, pagination cursors compare on it
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Weak ETags of read endpoints
 
     chantier = relationship("Chantier", back_populates="avenants")
     employee = relationship("UserProfile", foreign_keys=[employee_id])
+    delivery = relationship("AvenantDelivery", back_populates="avenant", uselist=False)
+
+class AvenantDelivery(Base):
+    __tablename__ = "avenant_deliveries"
+    __table_args__ = (
+        Index("ix_avenant_deliveries_status_next_attempt_at", "status", "next_attempt_at"),  # Worker polling
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    avenant_id = Column(UUID(as_uuid=True), ForeignKey("avenants.id"), nullable=False, unique=True)
+    status = Column(String, nullable=False, default="PENDING") # PENDING, RENDERED, SENT, FAILED
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    pdf_path = Column(Text, nullable=True)  # Set once the PDF has been rendered
+    pending_recipients = Column(Text, nullable=True)  # JSON list left to email after a partial failure, NULL = everyone
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # Worker skips the job until then
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+    avenant = relationship("Avenant", back_populates="delivery")
+
+class StoredFile(Base):
+    __tablename__ = "stored_files"
+
+    file_id = Column(String(64), primary_key=True)  # SHA-256 hex digest of the uploaded content
+    size = Column(Integer, nullable=False)
+    mime_type = Column(String, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)  # Number of avenants pointing at the file
+    created_at = Column(DateTime, default=func.now())
+    last_used_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+class ChantierRollup(Base):
+    __tablename__ = "chantier_rollups"
+
+    # Running totals of the chantier's avenants, kept up to date by app.rollups
+    chantier_id = Column(UUID(as_uuid=True), ForeignKey("chantiers.id"), primary_key=True)
+    company_id = Column(UUID(as_uuid=True), ForeignKey("companies.id"), nullable=False)
+    forfait_total_ht = Column(Numeric, nullable=False, default=0)
+    regie_total_ht = Column(Numeric, nullable=False, default=0)
+    forfait_count = Column(Integer, nullable=False, default=0)
+    regie_count = Column(Integer, nullable=False, default=0)
+    draft_count = Column(Integer, nullable=False, default=0)
+    signed_count = Column(Integer, nullable=False, default=0)
+    sent_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class CompanyRollup(Base):
+    __tablename__ = "company_rollups"
+
+    # Same totals over every chantier of the company
+    company_id = Column(UUID(as_uuid=True), ForeignKey("companies.id"), primary_key=True)
+    forfait_total_ht = Column(Numeric, nullable=False, default=0)
+    regie_total_ht = Column(Numeric, nullable=False, default=0)
+    forfait_count = Column(Integer, nullable=False, default=0)
+    regie_count = Column(Integer, nullable=False, default=0)
+    draft_count = Column(Integer, nullable=False, default=0)
+    signed_count = Column(Integer, nullable=False, default=0)
+    sent_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,76 @@
+"""
+Keyset (cursor) pagination on (created_at, id)
+
+Listings are ordered newest first by (created_at, id). A page is fetched
+with `WHERE (created_at, id) < (last created_at, last id)` instead of an
+OFFSET, so with a matching index every page costs the same as the first.
+The position is handed to clients as an opaque cursor.
+"""
+from datetime import datetime
+from typing import Optional, Tuple
+from uuid import UUID
+import base64
+import json
+import os
+
+from fastapi import HTTPException, status
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "200"))
+
+
+def encode_cursor(created_at: datetime, id: UUID) -> str:
+    payload = json.dumps([created_at.isoformat(), str(id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """Position encoded in a cursor, 400 if it was not produced by encode_cursor."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), UUID(id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def page_statement(statement, model, position: Optional[Tuple[datetime, UUID]], limit: int):
+    """statement restricted to the page after position (created_at, id), newest first, plus one row."""
+    if position:
+        statement = statement.where(tuple_(model.created_at, model.id) < position)
+    # One extra row tells whether there is a next page
+    return statement.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1)
+
+
+async def keyset_page(db, statement, model, cursor: Optional[str], limit: int, scalars: bool = True):
+    """
+    Fetch one page of statement, newest first
+
+    Args:
+        statement: select() of model, already filtered
+        model: mapped class with created_at and id columns
+        cursor: next_cursor of the previous page, None for the first page
+        limit: page size
+        scalars: False to get rows when statement selects more than model,
+            rows must then start with the model instance or have the
+            created_at and id columns (column-only selects)
+
+    Returns:
+        (items, next_cursor), next_cursor is None on the last page
+    """
+    position = decode_cursor(cursor) if cursor else None
+    result = await db.execute(page_statement(statement, model, position, limit))
+    items = result.scalars().all() if scalars else result.all()
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        if not scalars and isinstance(last[0], model):
+            last = last[0]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return items, next_cursor
@@ -0,0 +1,232 @@
+"""
+PDF rendering service running WeasyPrint in a bounded process pool
+"""
+import asyncio
+import faulthandler
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Optional
+
+from .pdf_generator import generate_avenant_pdf, get_render_resources
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Rendering configuration from environment variables
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", "2"))
+PDF_RENDER_QUEUE_SIZE = int(os.getenv("PDF_RENDER_QUEUE_SIZE", "8"))
+PDF_RENDER_TIMEOUT = float(os.getenv("PDF_RENDER_TIMEOUT", "60"))
+PDF_QUEUE_WAIT_TIMEOUT = float(os.getenv("PDF_QUEUE_WAIT_TIMEOUT", "5"))
+PDF_RENDER_MAX_TASKS_PER_CHILD = int(os.getenv("PDF_RENDER_MAX_TASKS_PER_CHILD", "100"))
+
+
+class PdfRenderError(Exception):
+    """Base error for PDF rendering failures."""
+
+
+class PdfQueueFullError(PdfRenderError):
+    """Raised when the submission queue stays full for too long."""
+
+
+class PdfRenderTimeoutError(PdfRenderError):
+    """Raised when a render job exceeds its timeout."""
+
+
+class _PoolReplaced(Exception):
+    """The render was lost with a pool that broke or was replaced, it can be retried."""
+
+
+# Seconds the event loop side waits beyond the timeout for the worker's own watchdog
+WATCHDOG_GRACE = 5
+
+
+def _run_job(func, timeout: float, kwargs: dict):
+    """Run a render in a worker process, ending the process if it outlives timeout."""
+    # The watchdog thread exits the process even when the render is stuck in
+    # C code (Pango, fontconfig) that nothing else can interrupt
+    faulthandler.dump_traceback_later(timeout, exit=True)
+    try:
+        return func(**kwargs)
+    finally:
+        faulthandler.cancel_dump_traceback_later()
+
+
+class PdfRenderService:
+    """
+    Run PDF renders in worker processes so the event loop never blocks.
+
+    At most `max_workers` renders run at once and at most `queue_size` more
+    wait for a free worker. Callers beyond that wait `queue_wait_timeout`
+    seconds for a slot before getting PdfQueueFullError.
+
+    A render still running after `timeout` ends its worker process (a
+    watchdog in the worker, see _run_job). A worker that dies, that way or
+    from a crash (OOM, Pango), breaks the whole pool: it is replaced by a
+    fresh one, and each render it took down is retried once in a process of
+    its own, so the render that broke the pool fails alone.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = PDF_RENDER_WORKERS,
+        queue_size: int = PDF_RENDER_QUEUE_SIZE,
+        timeout: float = PDF_RENDER_TIMEOUT,
+        queue_wait_timeout: float = PDF_QUEUE_WAIT_TIMEOUT,
+        max_tasks_per_child: int = PDF_RENDER_MAX_TASKS_PER_CHILD,
+    ):
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.queue_wait_timeout = queue_wait_timeout
+        self.max_tasks_per_child = max_tasks_per_child
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._slots = asyncio.Semaphore(max_workers + queue_size)
+        # Retries run one per process, at most as many processes as the pool
+        self._retry_slots = asyncio.Semaphore(max_workers)
+
+    def _new_pool(self, max_workers: int) -> ProcessPoolExecutor:
+        # spawn avoids forking a process that already runs an event loop
+        return ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            max_tasks_per_child=self.max_tasks_per_child or None,
+            # Parse the stylesheet and fonts before the first job arrives
+            initializer=get_render_resources,
+        )
+
+    def start(self):
+        """Start the worker processes (idempotent)."""
+        with self._executor_lock:
+            self._start()
+
+    def _start(self):
+        if self._executor is None:
+            self._executor = self._new_pool(self.max_workers)
+            logger.info(
+                f"[PDF] Render pool started: {self.max_workers} workers, "
+                f"queue size {self.queue_size}, timeout {self.timeout}s"
+            )
+
+    def shutdown(self):
+        """Stop the worker processes, dropping queued jobs."""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+                logger.info("[PDF] Render pool stopped")
+
+    def _replace(self, executor: ProcessPoolExecutor, reason: str):
+        """Swap a broken or stuck pool for a new one (no-op if already replaced)."""
+        with self._executor_lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+            self._start()
+        logger.warning(f"[PDF] Render pool replaced: {reason}")
+        # A broken pool has already ended its workers and failed its jobs,
+        # otherwise the jobs queued there still run before it stops
+        executor.shutdown(wait=False)
+
+    def _job_done(self, future: asyncio.Future):
+        self._slots.release()
+        # Nobody awaits a job that timed out, retrieve its outcome so it is not logged as lost
+        if not future.cancelled():
+            future.exception()
+
+    async def render(self, func, **kwargs):
+        """
+        Run `func(**kwargs)` in the pool and return its result.
+
+        Raises:
+            PdfQueueFullError, PdfRenderTimeoutError, or PdfRenderError if
+            the worker process died
+        """
+        try:
+            return await self._render_once(func, kwargs)
+        except _PoolReplaced:
+            logger.warning("[PDF] Render interrupted by a pool replacement, retrying alone")
+        # The render may be the one that broke the pool, so the retry gets a
+        # process of its own and cannot take other renders down again
+        return await self._render_isolated(func, kwargs)
+
+    async def _render_isolated(self, func, kwargs: dict):
+        async with self._retry_slots:
+            loop = asyncio.get_running_loop()
+            executor = self._new_pool(1)
+            started = loop.time()
+            try:
+                future = loop.run_in_executor(executor, partial(_run_job, func, self.timeout, kwargs))
+                return await asyncio.wait_for(future, timeout=self.timeout + WATCHDOG_GRACE)
+            except asyncio.TimeoutError:
+                raise PdfRenderTimeoutError(f"PDF rendering took longer than {self.timeout}s")
+            except BrokenProcessPool:
+                if loop.time() - started >= self.timeout:
+                    raise PdfRenderTimeoutError(f"PDF rendering took longer than {self.timeout}s")
+                raise PdfRenderError("PDF render worker crashed")
+            finally:
+                executor.shutdown(wait=False)
+
+    async def _render_once(self, func, kwargs: dict):
+        self.start()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_wait_timeout)
+        except asyncio.TimeoutError:
+            raise PdfQueueFullError("PDF render queue is full")
+
+        loop = asyncio.get_running_loop()
+        executor = self._executor
+        started = loop.time()
+        try:
+            future = loop.run_in_executor(executor, partial(_run_job, func, self.timeout, kwargs))
+        except BrokenProcessPool:
+            self._slots.release()
+            self._replace(executor, "a worker process died")
+            raise _PoolReplaced()
+        except RuntimeError:
+            # Shut down by a concurrent replacement between reading and submitting
+            self._slots.release()
+            if executor is self._executor:
+                raise
+            raise _PoolReplaced()
+        except Exception:
+            self._slots.release()
+            raise
+        # The slot is only released once the worker is really done with the job
+        future.add_done_callback(self._job_done)
+
+        try:
+            # shield so a timeout does not cancel the future and free the slot early
+            return await asyncio.wait_for(asyncio.shield(future), timeout=self.timeout + WATCHDOG_GRACE)
+        except asyncio.TimeoutError:
+            # The worker's watchdog should have ended it already
+            logger.error(f"[PDF] Render job still running {WATCHDOG_GRACE}s after its timeout")
+            self._replace(executor, "a render job did not stop")
+            raise PdfRenderTimeoutError(f"PDF rendering took longer than {self.timeout}s")
+        except BrokenProcessPool:
+            self._replace(executor, "a worker process died")
+            if loop.time() - started >= self.timeout:
+                # Most likely this job's own watchdog ended the worker
+                logger.error(f"[PDF] Render job timed out after {self.timeout}s")
+                raise PdfRenderTimeoutError(f"PDF rendering took longer than {self.timeout}s")
+            raise _PoolReplaced()
+
+
+pdf_render_service = PdfRenderService()
+
+
+async def render_avenant_pdf(**kwargs) -> str:
+    """
+    Render an avenant PDF without blocking the event loop.
+
+    Takes the same keyword arguments as generate_avenant_pdf.
+
+    Returns:
+        Path to the generated PDF file
+    """
+    return await pdf_render_service.render(generate_avenant_pdf, **kwargs)
@@ -0,0 +1,81 @@
+"""
+In-process cache of authenticated user principals
+
+A principal is the small part of a user profile needed to authorize a
+request (company, role, active flag, token version). Caching it lets
+get_current_principal authorize requests without a database round-trip.
+Entries expire after PRINCIPAL_CACHE_TTL seconds and must be invalidated
+whenever one of these fields changes.
+"""
+from collections import OrderedDict
+from typing import Optional
+from uuid import UUID
+import os
+import threading
+import time
+
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+
+
+class Principal:
+    """Authorization view of a user, usable wherever routers read current_user."""
+
+    __slots__ = ("id", "company_id", "role", "is_active", "token_version")
+
+    def __init__(self, id: UUID, company_id: UUID, role: str, is_active: bool, token_version: int):
+        self.id = id
+        self.company_id = company_id
+        self.role = role
+        self.is_active = is_active
+        self.token_version = token_version
+
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        return cls(
+            id=user.id,
+            company_id=user.company_id,
+            role=user.role,
+            is_active=user.is_active,
+            token_version=user.token_version or 0,
+        )
+
+
+class PrincipalCache:
+    """Thread-safe LRU cache of principals with a time-to-live."""
+
+    def __init__(self, ttl: float = PRINCIPAL_CACHE_TTL, max_size: int = PRINCIPAL_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[UUID, tuple[Principal, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: UUID) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            principal, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return principal
+
+    def set(self, principal: Principal):
+        with self._lock:
+            self._entries[principal.id] = (principal, time.monotonic() + self.ttl)
+            self._entries.move_to_end(principal.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: UUID):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache()
@@ -0,0 +1,251 @@
+"""
+Per-chantier and per-company avenant rollups
+
+chantier_rollups and company_rollups hold running totals (total HT and
+count by type, count by status) so owners can read them in O(1) whatever
+the history size. They are updated incrementally, in the same transaction
+as the change: record_avenant_created when an avenant is inserted and
+record_status_change whenever an avenant changes status.
+
+The totals can be checked or recomputed from the avenants table:
+
+    python -m app.rollups verify    # report drift, exit code 1 if any
+    python -m app.rollups rebuild   # recompute everything from scratch
+"""
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Optional
+from uuid import UUID
+import asyncio
+import sys
+
+from sqlalchemy import case, delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+from .database import dialect_insert, stream_rows
+
+TYPE_COLUMNS = {
+    "FORFAIT": ("forfait_total_ht", "forfait_count"),
+    "REGIE": ("regie_total_ht", "regie_count"),
+}
+STATUS_COLUMNS = {
+    "DRAFT": "draft_count",
+    "SIGNED": "signed_count",
+    "SENT": "sent_count",
+}
+TOTAL_COLUMNS = ("forfait_total_ht", "regie_total_ht")
+ROLLUP_COLUMNS = TOTAL_COLUMNS + ("forfait_count", "regie_count") + tuple(STATUS_COLUMNS.values())
+
+CENT = Decimal("0.01")
+
+
+def empty_totals() -> Dict[str, Decimal]:
+    return {column: Decimal(0) if column in TOTAL_COLUMNS else 0 for column in ROLLUP_COLUMNS}
+
+
+async def _increment(db: AsyncSession, model, key: dict, deltas: dict, **insert_values):
+    """Add deltas to the rollup row identified by key, creating it if needed."""
+    table = model.__table__
+    values = {**key, **insert_values, **empty_totals(), **deltas, "updated_at": datetime.utcnow()}
+    statement = dialect_insert(db, table).values(values)
+    statement = statement.on_conflict_do_update(
+        index_elements=list(key),
+        set_={
+            **{column: table.c[column] + statement.excluded[column] for column in deltas},
+            "updated_at": statement.excluded.updated_at,
+        },
+    )
+    await db.execute(statement)
+
+
+async def _apply(db: AsyncSession, chantier_id: UUID, company_id: UUID, deltas: dict):
+    if not deltas:
+        return
+    await _increment(
+        db, models.ChantierRollup, {"chantier_id": chantier_id}, deltas, company_id=company_id
+    )
+    await _increment(db, models.CompanyRollup, {"company_id": company_id}, deltas)
+
+
+async def record_avenant_created(db: AsyncSession, avenant: models.Avenant, company_id: UUID):
+    """Count a new avenant in its chantier and company rollups (does not commit)."""
+    deltas = {}
+    if avenant.type in TYPE_COLUMNS:
+        total_column, count_column = TYPE_COLUMNS[avenant.type]
+        deltas[total_column] = Decimal(avenant.total_ht)
+        deltas[count_column] = 1
+    if avenant.status in STATUS_COLUMNS:
+        deltas[STATUS_COLUMNS[avenant.status]] = 1
+    await _apply(db, avenant.chantier_id, company_id, deltas)
+
+
+async def record_status_change(
+    db: AsyncSession,
+    avenant: models.Avenant,
+    company_id: UUID,
+    old_status: Optional[str],
+    new_status: Optional[str],
+):
+    """Move an avenant between status counts (does not commit)."""
+    if old_status == new_status:
+        return
+    deltas = {}
+    if old_status in STATUS_COLUMNS:
+        deltas[STATUS_COLUMNS[old_status]] = -1
+    if new_status in STATUS_COLUMNS:
+        deltas[STATUS_COLUMNS[new_status]] = 1
+    await _apply(db, avenant.chantier_id, company_id, deltas)
+
+
+def rollup_values(row) -> dict:
+    """Totals of a rollup row for the API, zeros when there is no row yet."""
+    if row is None:
+        return {**empty_totals(), "updated_at": None}
+    values = {column: getattr(row, column) for column in ROLLUP_COLUMNS}
+    for column in TOTAL_COLUMNS:
+        values[column] = Decimal(values[column]).quantize(CENT)
+    values["updated_at"] = row.updated_at
+    return values
+
+
+def _aggregate_statement():
+    """Rollup columns recomputed from avenants, one row per chantier."""
+    columns = []
+    for avenant_type, (total_column, count_column) in TYPE_COLUMNS.items():
+        is_type = models.Avenant.type == avenant_type
+        columns.append(func.sum(case((is_type, models.Avenant.total_ht), else_=0)).label(total_column))
+        columns.append(func.sum(case((is_type, 1), else_=0)).label(count_column))
+    for avenant_status, count_column in STATUS_COLUMNS.items():
+        columns.append(
+            func.sum(case((models.Avenant.status == avenant_status, 1), else_=0)).label(count_column)
+        )
+    return (
+        select(models.Avenant.chantier_id, models.Chantier.company_id, *columns)
+        .join(models.Chantier, models.Avenant.chantier_id == models.Chantier.id)
+        .group_by(models.Avenant.chantier_id, models.Chantier.company_id)
+    )
+
+
+async def compute_rollups(db: AsyncSession):
+    """
+    Recompute every rollup from the avenants table
+
+    Returns:
+        ({chantier_id: (company_id, totals)}, {company_id: totals})
+    """
+    chantiers = {}
+    companies = {}
+    async for row in stream_rows(db, _aggregate_statement()):
+        totals = {column: getattr(row, column) or 0 for column in ROLLUP_COLUMNS}
+        for column in TOTAL_COLUMNS:
+            totals[column] = Decimal(totals[column])
+        chantiers[row.chantier_id] = (row.company_id, totals)
+
+        company_totals = companies.setdefault(row.company_id, empty_totals())
+        for column in ROLLUP_COLUMNS:
+            company_totals[column] += totals[column]
+    return chantiers, companies
+
+
+def _drift(expected: dict, actual: dict) -> dict:
+    """Columns whose stored value differs from the recomputed one."""
+    drift = {}
+    for column in ROLLUP_COLUMNS:
+        want, got = expected[column], actual[column]
+        if column in TOTAL_COLUMNS:
+            want, got = Decimal(want).quantize(CENT), Decimal(got).quantize(CENT)
+        if want != got:
+            drift[column] = (want, got)
+    return drift
+
+
+async def verify(db: AsyncSession) -> list:
+    """
+    Compare stored rollups with recomputed ones
+
+    Returns:
+        List of (table, key, {column: (expected, stored)}) for every drifting row
+    """
+    expected_chantiers, expected_companies = await compute_rollups(db)
+    problems = []
+
+    stored = {
+        row.chantier_id: row
+        for row in (await db.execute(select(models.ChantierRollup))).scalars()
+    }
+    for chantier_id in set(expected_chantiers) | set(stored):
+        expected = expected_chantiers.get(chantier_id, (None, empty_totals()))[1]
+        row = stored.get(chantier_id)
+        actual = {column: getattr(row, column) for column in ROLLUP_COLUMNS} if row else empty_totals()
+        drift = _drift(expected, actual)
+        if drift:
+            problems.append(("chantier_rollups", chantier_id, drift))
+
+    stored = {
+        row.company_id: row
+        for row in (await db.execute(select(models.CompanyRollup))).scalars()
+    }
+    for company_id in set(expected_companies) | set(stored):
+        expected = expected_companies.get(company_id, empty_totals())
+        row = stored.get(company_id)
+        actual = {column: getattr(row, column) for column in ROLLUP_COLUMNS} if row else empty_totals()
+        drift = _drift(expected, actual)
+        if drift:
+            problems.append(("company_rollups", company_id, drift))
+
+    return problems
+
+
+async def rebuild(db: AsyncSession) -> int:
+    """
+    Replace every rollup row by values recomputed from avenants (commits)
+
+    Avenants created while the rebuild runs may be counted twice or missed,
+    run it when the application is idle or follow it with verify.
+
+    Returns:
+        Number of chantier rollups written
+    """
+    chantiers, companies = await compute_rollups(db)
+    now = datetime.utcnow()
+
+    await db.execute(delete(models.ChantierRollup))
+    await db.execute(delete(models.CompanyRollup))
+    for chantier_id, (company_id, totals) in chantiers.items():
+        db.add(models.ChantierRollup(
+            chantier_id=chantier_id, company_id=company_id, updated_at=now, **totals
+        ))
+    for company_id, totals in companies.items():
+        db.add(models.CompanyRollup(company_id=company_id, updated_at=now, **totals))
+    await db.commit()
+    return len(chantiers)
+
+
+async def _main(argv):
+    from .database import AsyncSessionLocal
+
+    if not argv or argv[0] not in ("verify", "rebuild"):
+        print(__doc__)
+        return 1
+
+    async with AsyncSessionLocal() as db:
+        if argv[0] == "rebuild":
+            count = await rebuild(db)
+            print(f"[ROLLUPS] Rebuilt rollups of {count} chantier(s)")
+            return 0
+
+        problems = await verify(db)
+
+    for table, key, drift in problems:
+        details = ", ".join(
+            f"{column}: expected {expected}, stored {stored}"
+            for column, (expected, stored) in drift.items()
+        )
+        print(f"[ROLLUPS] Drift in {table} {key}: {details}")
+    print(f"[ROLLUPS] {len(problems)} drifting row(s)")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
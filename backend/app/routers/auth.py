@@ -1,18 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Header
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from datetime import datetime, timedelta
 from typing import Optional
 from uuid import UUID
-from .. import models, schemas, database
+from .. import http_cache, models, schemas, database
 from ..auth_utils import (
-    verify_password,
-    get_password_hash,
-    create_access_token,
+    verify_and_update_password,
+    get_password_hash_async,
+    create_user_access_token,
     decode_access_token,
     generate_token,
 )
 from ..email import send_invitation_email, send_password_reset_email
+from ..principals import Principal, principal_cache
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -52,7 +53,7 @@ async def register(
     user = models.UserProfile(
         company_id=company.id,
         email=user_data.email,
-        password_hash=get_password_hash(user_data.password),
+        password_hash=await get_password_hash_async(user_data.password),
         role="OWNER",
         is_active=True,
     )
@@ -61,7 +62,7 @@ async def register(
     await db.refresh(user)
 
     # Create access token
-    access_token = create_access_token(data={"sub": str(user.id)})
+    access_token = create_user_access_token(user)
 
     # Create user dict with company name
     user_dict = {
@@ -98,7 +99,10 @@ async def login(
             detail="Incorrect email or password",
         )
 
-    if not verify_password(credentials.password, user.password_hash):
+    password_valid, new_hash = await verify_and_update_password(
+        credentials.password, user.password_hash
+    )
+    if not password_valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -110,8 +114,13 @@ async def login(
             detail="Account is not active",
         )
 
+    # Upgrade the hash if the bcrypt cost factor changed
+    if new_hash:
+        user.password_hash = new_hash
+        await db.commit()
+
     # Create access token
-    access_token = create_access_token(data={"sub": str(user.id)})
+    access_token = create_user_access_token(user)
 
     # Get company info
     result_company = await db.execute(
@@ -137,12 +146,8 @@ async def login(
     )
 
 
-# Get current user from JWT token
-async def get_current_user(
-    authorization: Optional[str] = Header(None),
-    db: AsyncSession = Depends(database.get_db),
-):
-    """Get current authenticated user from JWT token"""
+def _decode_bearer_token(authorization: Optional[str]) -> tuple[UUID, dict]:
+    """Decode the bearer token and return (user id, payload)"""
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -172,6 +177,26 @@ async def get_current_user(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid user ID"
         )
 
+    return uuid_obj, payload
+
+
+def _check_token_version(payload: dict, token_version: int):
+    """Reject tokens issued before the user's token version was bumped"""
+    if payload.get("tv", 0) != (token_version or 0):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+        )
+
+
+# Get current user from JWT token
+async def get_current_user(
+    authorization: Optional[str] = Header(None),
+    db: AsyncSession = Depends(database.get_db),
+):
+    """Get current authenticated user from JWT token"""
+    uuid_obj, payload = _decode_bearer_token(authorization)
+
     result = await db.execute(
         select(models.UserProfile).where(models.UserProfile.id == uuid_obj)
     )
@@ -183,13 +208,81 @@ async def get_current_user(
             detail="User not found or inactive",
         )
 
+    _check_token_version(payload, user.token_version)
+    principal_cache.set(Principal.from_user(user))
+
     return user
 
 
+def _principal_from_claims(user_id: UUID, payload: dict, is_active: bool, token_version: int) -> Optional[Principal]:
+    """Principal built from the cid/role claims, None for tokens issued without them"""
+    try:
+        company_id = UUID(payload["cid"])
+        role = payload["role"]
+    except (KeyError, TypeError, ValueError):
+        return None
+    return Principal(
+        id=user_id, company_id=company_id, role=role, is_active=is_active, token_version=token_version or 0
+    )
+
+
+# Get current principal from JWT token, without a database round-trip when cached
+async def get_current_principal(
+    authorization: Optional[str] = Header(None),
+    db: AsyncSession = Depends(database.get_db),
+) -> Principal:
+    """Get the authorization info (company, role) of the current user"""
+    uuid_obj, payload = _decode_bearer_token(authorization)
+
+    principal = principal_cache.get(uuid_obj)
+    cached = principal is not None
+    if not cached:
+        # Company and role come from the token claims. A role change bumps
+        # token_version, so a matching tv vouches for them: only the
+        # revocation fields are read from the database.
+        result = await db.execute(
+            select(models.UserProfile.is_active, models.UserProfile.token_version)
+            .where(models.UserProfile.id == uuid_obj)
+        )
+        row = result.first()
+        if row:
+            principal = _principal_from_claims(uuid_obj, payload, row.is_active, row.token_version)
+            if principal is None:
+                # Token issued before the claims existed
+                result = await db.execute(
+                    select(models.UserProfile).where(models.UserProfile.id == uuid_obj)
+                )
+                principal = Principal.from_user(result.scalars().one())
+
+    if not principal or not principal.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found or inactive",
+        )
+
+    # Checked before caching, the claims of a revoked token must not be cached
+    _check_token_version(payload, principal.token_version)
+    if not cached:
+        principal_cache.set(principal)
+
+    return principal
+
+
 # Get current user info
 @router.get("/me", response_model=schemas.UserProfile)
-async def get_me(current_user: models.UserProfile = Depends(get_current_user)):
+async def get_me(
+    request: Request,
+    response: Response,
+    current_user: models.UserProfile = Depends(get_current_user),
+):
     """Get current user profile"""
+    not_modified = http_cache.conditional_response(
+        request, response,
+        http_cache.weak_etag("me", current_user.id, current_user.updated_at),
+        last_modified=current_user.updated_at,
+    )
+    if not_modified:
+        return not_modified
     return current_user
 
 
@@ -197,7 +290,7 @@ async def get_me(current_user: models.UserProfile = Depends(get_current_user)):
 @router.post("/invite-employee")
 async def invite_employee(
     invite_data: schemas.InviteEmployee,
-    current_user: models.UserProfile = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(database.get_db),
 ):
     """Invite a new employee to the company (OWNER only)"""
@@ -273,7 +366,7 @@ async def activate_account(
         )
 
     # Set password and activate account
-    user.password_hash = get_password_hash(activation_data.password)
+    user.password_hash = await get_password_hash_async(activation_data.password)
     user.is_active = True
     user.invitation_token = None
     user.token_expires_at = None
@@ -282,7 +375,7 @@ async def activate_account(
     await db.refresh(user)
 
     # Create access token
-    access_token = create_access_token(data={"sub": str(user.id)})
+    access_token = create_user_access_token(user)
 
     # Get company info
     result_company = await db.execute(
@@ -365,15 +458,18 @@ async def reset_password(
         )
 
     # Set new password
-    user.password_hash = get_password_hash(reset_data.password)
+    user.password_hash = await get_password_hash_async(reset_data.password)
     user.reset_token = None
     user.token_expires_at = None
+    # Log out every other session
+    user.token_version = (user.token_version or 0) + 1
 
     await db.commit()
     await db.refresh(user)
+    principal_cache.invalidate(user.id)
 
     # Create access token
-    access_token = create_access_token(data={"sub": str(user.id)})
+    access_token = create_user_access_token(user)
 
     # Get company info
     result_company = await db.execute(
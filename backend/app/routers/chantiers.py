@@ -1,102 +1,213 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import List
+from sqlalchemy import case, func
+from typing import Optional
+from decimal import Decimal
+from urllib.parse import quote
 from uuid import UUID
-from .. import models, schemas, database
-from .auth import get_current_user
+from .. import http_cache, models, rollups, schemas, database
+from .auth import get_current_principal
+from ..avenant_documents import prepare_signed_avenants_export, stream_avenants_zip
+from ..field_selection import list_columns, requested_fields
+from ..pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_page
+from ..pdf_service import PdfQueueFullError, PdfRenderError
+from ..principals import Principal
+from ..responses import rows_json
+from ..tenancy import ensure_chantier_access, get_chantier_or_404, scoped_avenants, scoped_chantiers
 
 router = APIRouter(
     prefix="/chantiers",
     tags=["chantiers"]
 )
 
+# Listing queries, also checked by check_query_plans.py
+def chantiers_statement(principal: Principal, selected):
+    return scoped_chantiers(principal, *list_columns(models.Chantier, selected))
+
+def chantiers_summary_statement(principal: Principal):
+    signed_total = func.coalesce(
+        func.sum(
+            case((models.Avenant.status.in_(["SIGNED", "SENT"]), models.Avenant.total_ht), else_=0)
+        ),
+        0,
+    )
+    return (
+        scoped_chantiers(
+            principal,
+            models.Chantier,
+            func.count(models.Avenant.id).label("avenant_count"),
+            signed_total.label("signed_total_ht"),
+            func.max(models.Avenant.created_at).label("last_avenant_at"),
+        )
+        .outerjoin(models.Avenant, models.Avenant.chantier_id == models.Chantier.id)
+        .group_by(models.Chantier.id)
+    )
+
+def chantier_avenants_statement(principal: Principal, chantier_id: UUID, selected):
+    return (
+        scoped_avenants(principal, *list_columns(models.Avenant, selected))
+        .where(models.Avenant.chantier_id == chantier_id)
+    )
+
 @router.post("/", response_model=schemas.Chantier)
 async def create_chantier(
     chantier: schemas.ChantierCreate,
     db: AsyncSession = Depends(database.get_db),
-    current_user: models.UserProfile = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     new_chantier = models.Chantier(**chantier.model_dump(), company_id=current_user.company_id)
     db.add(new_chantier)
     await db.commit()
-    await db.refresh(new_chantier)
     return new_chantier
 
-@router.get("/", response_model=List[schemas.Chantier])
+@router.get("/", response_model=schemas.ChantierPage)
 async def read_chantiers(
-    skip: int = 0,
-    limit: int = 100,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description="'compact' or comma-separated field names, all fields by default"),
     db: AsyncSession = Depends(database.get_db),
-    current_user: models.UserProfile = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
-    result = await db.execute(
-        select(models.Chantier)
-        .where(models.Chantier.company_id == current_user.company_id)
-        .offset(skip)
-        .limit(limit)
+    """List the company's chantiers, newest first, one page at a time"""
+    selected = requested_fields(schemas.Chantier, schemas.ChantierListItem, fields)
+    chantiers, next_cursor = await keyset_page(
+        db,
+        chantiers_statement(current_user, selected),
+        models.Chantier,
+        cursor,
+        limit,
+        scalars=False,
+    )
+    return rows_json(
+        schemas.Chantier, chantiers, extra={"next_cursor": next_cursor}, fields=selected
+    )
+
+# Registered before /{chantier_id} so "summary" is not parsed as an id
+@router.get("/summary", response_model=schemas.ChantierSummaryPage)
+async def read_chantiers_summary(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(database.get_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """List the company's chantiers with their avenant count, signed total and last avenant date"""
+    rows, next_cursor = await keyset_page(
+        db,
+        chantiers_summary_statement(current_user),
+        models.Chantier,
+        cursor,
+        limit,
+        scalars=False,
     )
-    chantiers = result.scalars().all()
-    return chantiers
+    items = [
+        schemas.ChantierSummary(
+            **schemas.Chantier.model_validate(chantier).model_dump(),
+            avenant_count=avenant_count,
+            signed_total_ht=Decimal(signed_total_ht).quantize(Decimal("0.01")),
+            last_avenant_at=last_avenant_at,
+        )
+        for chantier, avenant_count, signed_total_ht, last_avenant_at in rows
+    ]
+    return {"items": items, "next_cursor": next_cursor}
 
-@router.get("/{chantier_id}/avenants", response_model=List[schemas.Avenant])
+@router.get("/{chantier_id}/avenants", response_model=schemas.AvenantPage)
 async def get_chantier_avenants(
     chantier_id: UUID,
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description="'compact' or comma-separated field names, all fields by default"),
     db: AsyncSession = Depends(database.get_db),
-    current_user: models.UserProfile = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
-    """Get all avenants for a specific chantier"""
-    # Verify chantier exists and belongs to user's company
-    result = await db.execute(
-        select(models.Chantier).where(models.Chantier.id == chantier_id)
+    """Get the avenants of a specific chantier, newest first, one page at a time"""
+    selected = requested_fields(schemas.Avenant, schemas.AvenantListItem, fields)
+    # Ownership is checked by the join, an empty page may also mean "not yours"
+    avenants, next_cursor = await keyset_page(
+        db,
+        chantier_avenants_statement(current_user, chantier_id, selected),
+        models.Avenant,
+        cursor,
+        limit,
+        scalars=False,
     )
-    chantier = result.scalars().first()
+    if not avenants:
+        await ensure_chantier_access(db, chantier_id, current_user)
 
-    if not chantier:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Chantier not found"
-        )
+    etag = http_cache.weak_etag(
+        "avenants", chantier_id, cursor, limit, next_cursor, selected,
+        *((avenant.id, avenant.updated_at) for avenant in avenants),
+    )
+    not_modified = http_cache.conditional_response(request, response, etag)
+    if not_modified:
+        return not_modified
+    return rows_json(
+        schemas.Avenant, avenants, extra={"next_cursor": next_cursor},
+        headers=response.headers, fields=selected,
+    )
 
-    if chantier.company_id != current_user.company_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to access this chantier"
-        )
+@router.get("/{chantier_id}/avenants/export.zip")
+async def export_chantier_avenants(
+    chantier_id: UUID,
+    db: AsyncSession = Depends(database.get_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Download the PDFs of every signed avenant of a chantier as one ZIP, streamed as it is built"""
+    chantier = await get_chantier_or_404(db, chantier_id, current_user)
+    filename = quote(f"avenants_{chantier.name}.zip")
 
-    # Get all avenants for this chantier
-    result = await db.execute(
-        select(models.Avenant)
-        .where(models.Avenant.chantier_id == chantier_id)
-        .order_by(models.Avenant.created_at.desc())
-    )
-    avenants = result.scalars().all()
+    # Every PDF exists before the 200 is sent, a failure is still an error status
+    try:
+        entries = await prepare_signed_avenants_export(db, chantier)
+    except PdfQueueFullError:
+        raise HTTPException(status_code=503, detail="PDF rendering is busy, retry later", headers={"Retry-After": "5"})
+    except PdfRenderError:
+        raise HTTPException(status_code=500, detail="PDF rendering failed")
 
-    return avenants
+    return StreamingResponse(
+        stream_avenants_zip(entries),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename*=utf-8''{filename}"},
+    )
 
-@router.get("/{chantier_id}", response_model=schemas.Chantier)
-async def get_chantier(
+@router.get("/{chantier_id}/rollup", response_model=schemas.Rollup)
+async def get_chantier_rollup(
     chantier_id: UUID,
     db: AsyncSession = Depends(database.get_db),
-    current_user: models.UserProfile = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
-    """Get a specific chantier by ID"""
+    """Running avenant totals of a chantier, read from its rollup row"""
     result = await db.execute(
-        select(models.Chantier).where(models.Chantier.id == chantier_id)
+        scoped_chantiers(current_user, models.Chantier.id, models.ChantierRollup)
+        .outerjoin(models.ChantierRollup, models.ChantierRollup.chantier_id == models.Chantier.id)
+        .where(models.Chantier.id == chantier_id)
     )
-    chantier = result.scalars().first()
-
-    if not chantier:
+    row = result.first()
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Chantier not found"
         )
+    return rollups.rollup_values(row.ChantierRollup)
 
-    # Verify chantier belongs to user's company
-    if chantier.company_id != current_user.company_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to access this chantier"
-        )
+@router.get("/{chantier_id}", response_model=schemas.Chantier)
+async def get_chantier(
+    chantier_id: UUID,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(database.get_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Get a specific chantier by ID"""
+    chantier = await get_chantier_or_404(db, chantier_id, current_user)
 
+    not_modified = http_cache.conditional_response(
+        request, response,
+        http_cache.weak_etag("chantier", chantier.id, chantier.updated_at),
+        last_modified=chantier.updated_at,
+    )
+    if not_modified:
+        return not_modified
     return chantier
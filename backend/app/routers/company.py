@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, delete
 from typing import List
 from uuid import UUID
-from .. import models, schemas, database
-from .auth import get_current_user
+from .. import http_cache, models, rollups, schemas, database
+from .auth import get_current_principal
+from ..principals import Principal, principal_cache
 
 router = APIRouter(prefix="/company", tags=["company"])
 
@@ -12,7 +13,9 @@ router = APIRouter(prefix="/company", tags=["company"])
 # Get company info
 @router.get("/info", response_model=schemas.Company)
 async def get_company_info(
-    current_user: models.UserProfile = Depends(get_current_user),
+    request: Request,
+    response: Response,
+    current_user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(database.get_db),
 ):
     """Get company information"""
@@ -27,14 +30,37 @@ async def get_company_info(
             detail="Company not found",
         )
 
+    not_modified = http_cache.conditional_response(
+        request, response,
+        http_cache.weak_etag("company", company.id, company.updated_at),
+        cache_control=http_cache.SHORT_CACHE,
+        last_modified=company.updated_at,
+    )
+    if not_modified:
+        return not_modified
     return company
 
 
+# Get running avenant totals of the company
+@router.get("/rollup", response_model=schemas.Rollup)
+async def get_company_rollup(
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(database.get_db),
+):
+    """Running avenant totals of the company, read from its rollup row"""
+    result = await db.execute(
+        select(models.CompanyRollup).where(
+            models.CompanyRollup.company_id == current_user.company_id
+        )
+    )
+    return rollups.rollup_values(result.scalars().first())
+
+
 # Update company name (OWNER only)
 @router.put("/update", response_model=schemas.Company)
 async def update_company(
     company_data: schemas.UpdateCompany,
-    current_user: models.UserProfile = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(database.get_db),
 ):
     """Update company name (OWNER only)"""
@@ -79,7 +105,7 @@ async def update_company(
 # List all employees (OWNER only)
 @router.get("/employees", response_model=List[schemas.EmployeeInfo])
 async def list_employees(
-    current_user: models.UserProfile = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(database.get_db),
 ):
     """List all company employees (OWNER only)"""
@@ -104,7 +130,7 @@ async def list_employees(
 async def update_employee_role(
     employee_id: UUID,
     role_data: schemas.UpdateEmployeeRole,
-    current_user: models.UserProfile = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(database.get_db),
 ):
     """Update employee role (OWNER only)"""
@@ -144,8 +170,11 @@ async def update_employee_role(
         )
 
     employee.role = role_data.role
+    # Tokens carry the role: revoke the ones issued with the old role
+    employee.token_version = (employee.token_version or 0) + 1
     await db.commit()
     await db.refresh(employee)
+    principal_cache.invalidate(employee.id)
 
     return employee
 
@@ -154,7 +183,7 @@ async def update_employee_role(
 @router.delete("/employees/{employee_id}")
 async def delete_employee(
     employee_id: UUID,
-    current_user: models.UserProfile = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(database.get_db),
 ):
     """Delete employee (OWNER only)"""
@@ -188,5 +217,6 @@ async def delete_employee(
 
     await db.delete(employee)
     await db.commit()
+    principal_cache.invalidate(employee_id)
 
     return {"message": "Employee deleted successfully"}
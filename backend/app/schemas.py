@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from uuid import UUID
 from decimal import Decimal
@@ -89,6 +89,11 @@ class ChantierBase(BaseModel):
 class ChantierCreate(ChantierBase):
     pass
 
+class ChantierListItem(BaseModel):  # Compact chantier for list screens (?fields=compact)
+    id: UUID
+    name: str
+    created_at: datetime
+
 class Chantier(ChantierBase):
     id: UUID
     company_id: UUID
@@ -105,10 +110,10 @@ class AvenantBase(BaseModel):
     hourly_rate: Optional[Decimal] = None
     photo_url: Optional[str] = None
     signature_url: Optional[str] = None
-    signature_data: Optional[str] = None  # For base64 signature upload
 
 class AvenantCreate(AvenantBase):
     chantier_id: UUID
+    signature_data: Optional[str] = None  # For base64 signature upload, never sent back
 
 class Avenant(AvenantBase):
     id: UUID
@@ -118,6 +123,52 @@ class Avenant(AvenantBase):
     status: str
     created_at: datetime
     employee_id: Optional[UUID] = None
+    pdf_file_id: Optional[str] = None  # Version of GET /avenants/{id}/pdf, None until rendered
+
+    class Config:
+        from_attributes = True
+
+class AvenantListItem(BaseModel):  # Compact avenant for list screens (?fields=compact)
+    id: UUID
+    type: str
+    total_ht: Decimal
+    status: str
+    created_at: datetime
+
+class ChantierSummary(Chantier):
+    avenant_count: int
+    signed_total_ht: Decimal  # Avenants SIGNED or SENT
+    last_avenant_at: Optional[datetime] = None
+
+class ChantierSummaryPage(BaseModel):
+    items: List[ChantierSummary]
+    next_cursor: Optional[str] = None
+
+class Rollup(BaseModel):
+    forfait_total_ht: Decimal
+    regie_total_ht: Decimal
+    forfait_count: int
+    regie_count: int
+    draft_count: int
+    signed_count: int
+    sent_count: int
+    updated_at: Optional[datetime] = None
+
+class ChantierPage(BaseModel):
+    items: List[Chantier]
+    next_cursor: Optional[str] = None
+
+class AvenantPage(BaseModel):
+    items: List[Avenant]
+    next_cursor: Optional[str] = None
+
+class AvenantDelivery(BaseModel):
+    avenant_id: UUID
+    status: str
+    attempts: int
+    last_error: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
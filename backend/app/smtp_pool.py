@@ -0,0 +1,178 @@
+"""
+Pool of reusable SMTP connections
+
+Each connection pays for TCP connect, STARTTLS and AUTH once and is then
+reused for many messages. Idle connections are health-checked with NOOP
+before reuse, closed after `idle_timeout` seconds (keeping `min_size` warm)
+and transparently replaced when the server drops them.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Optional, Tuple
+
+import aiosmtplib
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Errors after which a connection cannot be trusted anymore
+CONNECTION_ERRORS = (
+    aiosmtplib.SMTPServerDisconnected,
+    aiosmtplib.SMTPConnectError,
+    aiosmtplib.SMTPTimeoutError,
+    ConnectionError,
+    asyncio.TimeoutError,
+)
+
+
+class SMTPConnectionPool:
+    """
+    Bounded pool of authenticated aiosmtplib.SMTP clients.
+
+    Usage:
+        async with pool.connection() as client:
+            await client.send_message(message)
+
+    or simply `await pool.send_message(message)`, which also retries once on
+    a fresh connection if a pooled one turns out to be dead.
+    """
+
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        username: str = "",
+        password: str = "",
+        start_tls: bool = True,
+        use_tls: bool = False,
+        min_size: int = 0,
+        max_size: int = 4,
+        idle_timeout: float = 60,
+        health_check_after: float = 5,
+        timeout: float = 30,
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.start_tls = start_tls
+        self.use_tls = use_tls
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.timeout = timeout
+
+        self._idle: Deque[Tuple[aiosmtplib.SMTP, float]] = deque()
+        self._slots = asyncio.Semaphore(max_size)
+        self._reaper: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Open `min_size` connections and start the idle reaper."""
+        self._start_reaper()
+        while len(self._idle) < self.min_size:
+            try:
+                client = await self._connect()
+            except Exception as e:
+                logger.warning(f"[SMTP] Could not warm up connection pool: {e}")
+                break
+            self._idle.append((client, time.monotonic()))
+
+    async def close(self):
+        """Close every idle connection and stop the reaper."""
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        while self._idle:
+            client, _ = self._idle.popleft()
+            await self._disconnect(client)
+
+    @asynccontextmanager
+    async def connection(self):
+        """Borrow a connection, discarding it if it fails while borrowed."""
+        self._start_reaper()
+        await self._slots.acquire()
+        client = None
+        try:
+            client = await self._get_connection()
+            yield client
+        except CONNECTION_ERRORS:
+            if client is not None:
+                await self._disconnect(client)
+                client = None
+            raise
+        finally:
+            if client is not None:
+                if client.is_connected:
+                    self._idle.append((client, time.monotonic()))
+                else:
+                    await self._disconnect(client)
+            self._slots.release()
+
+    async def send_message(self, message, **kwargs):
+        """Send a message, reconnecting once if the pooled connection is dead."""
+        try:
+            async with self.connection() as client:
+                return await client.send_message(message, **kwargs)
+        except CONNECTION_ERRORS as e:
+            logger.warning(f"[SMTP] Connection failed ({e}), retrying on a new connection")
+            async with self.connection() as client:
+                return await client.send_message(message, **kwargs)
+
+    async def _get_connection(self) -> aiosmtplib.SMTP:
+        """Reuse a healthy idle connection or open a new one."""
+        while self._idle:
+            # Most recently used first: it is the least likely to be stale
+            client, last_used = self._idle.pop()
+            if await self._is_healthy(client, last_used):
+                return client
+            await self._disconnect(client)
+        return await self._connect()
+
+    async def _is_healthy(self, client: aiosmtplib.SMTP, last_used: float) -> bool:
+        if not client.is_connected:
+            return False
+        if time.monotonic() - last_used > self.health_check_after:
+            try:
+                await client.noop()
+            except Exception:
+                return False
+        return True
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        client = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            use_tls=self.use_tls,
+            start_tls=self.start_tls,
+            timeout=self.timeout,
+        )
+        await client.connect()
+        if self.username:
+            await client.login(self.username, self.password)
+        logger.info(f"[SMTP] Opened connection to {self.hostname}:{self.port}")
+        return client
+
+    async def _disconnect(self, client: aiosmtplib.SMTP):
+        try:
+            if client.is_connected:
+                await client.quit()
+        except Exception:
+            client.close()
+
+    def _start_reaper(self):
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap_idle())
+
+    async def _reap_idle(self):
+        """Periodically close connections idle for longer than idle_timeout."""
+        while True:
+            await asyncio.sleep(max(self.idle_timeout / 2, 1))
+            now = time.monotonic()
+            # Oldest connections sit at the left of the deque
+            while len(self._idle) > self.min_size and now - self._idle[0][1] > self.idle_timeout:
+                client, _ = self._idle.popleft()
+                await self._disconnect(client)
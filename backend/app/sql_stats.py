@@ -0,0 +1,106 @@
+"""
+Per-request SQL statistics and slow-query log
+
+SQLAlchemy cursor events time every statement. Inside an HTTP request the
+timings are added to the QueryStats of that request (held in a contextvar
+set by the middleware in main.py), so it can report how many statements it
+ran, the total time spent in the database and its slowest statement.
+Statements slower than SLOW_QUERY_THRESHOLD_MS are logged as JSON with the
+shape of their bound parameters (names and types, never values).
+"""
+from contextvars import ContextVar
+from typing import Optional
+import json
+import logging
+import os
+import time
+
+from sqlalchemy import event
+
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "100"))
+# Adds the X-SQL-Stats response header, not for production
+SQL_STATS_HEADER = os.getenv("SQL_STATS_HEADER", "false").lower() == "true"
+
+logger = logging.getLogger(__name__)
+
+_current_stats: ContextVar[Optional["QueryStats"]] = ContextVar("sql_query_stats", default=None)
+
+
+class QueryStats:
+    """SQL statements run while handling one request."""
+
+    __slots__ = ("count", "total_ms", "slowest_ms", "slowest_statement")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest_statement: Optional[str] = None
+
+    def record(self, statement: str, elapsed_ms: float):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms > self.slowest_ms:
+            self.slowest_ms = elapsed_ms
+            self.slowest_statement = statement
+
+    def header_value(self) -> str:
+        return f"count={self.count}; total={self.total_ms:.1f}ms; slowest={self.slowest_ms:.1f}ms"
+
+
+def start_request() -> QueryStats:
+    """Start collecting statistics for the current request (or task)."""
+    stats = QueryStats()
+    _current_stats.set(stats)
+    return stats
+
+
+def current_stats() -> Optional[QueryStats]:
+    return _current_stats.get()
+
+
+def parameter_shape(parameters, executemany: bool = False):
+    """Names and types of bound parameters, without their values."""
+    if executemany:
+        rows = list(parameters or [])
+        return {"rows": len(rows), "row": parameter_shape(rows[0]) if rows else None}
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info["query_start_time"].pop()) * 1000
+
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed_ms)
+
+    if elapsed_ms >= SLOW_QUERY_THRESHOLD_MS:
+        logger.warning(json.dumps({
+            "event": "slow_query",
+            "duration_ms": round(elapsed_ms, 2),
+            "statement": " ".join(statement.split()),
+            "parameters": parameter_shape(parameters, executemany),
+            "executemany": executemany,
+        }))
+
+
+def _handle_error(exception_context):
+    # The statement failed, after_cursor_execute will not run
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start_time"):
+        conn.info["query_start_time"].pop()
+
+
+def install(sync_engine):
+    """Time every statement run through the given (sync) engine."""
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
@@ -0,0 +1,187 @@
+"""
+Content-addressed storage for uploaded files
+
+Files are stored once under their SHA-256 (`file_id`), sharded as
+objects/ab/cd/abcd... so no directory grows too large. Writing content that
+is already stored is a no-op, so client retries and re-submitted photos do
+not cost disk space or write I/O. The stored_files table keeps a reference
+count per file, incremented for each avenant pointing at it.
+
+For photos the file_id is the hash of the bytes the client uploaded, while
+the stored object is their normalized version: a re-upload is recognized
+before any decoding work is done.
+
+Usage: python -m app.storage gc [max_age_hours]
+"""
+from sqlalchemy import select, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timedelta
+from typing import Optional
+import asyncio
+import hashlib
+import os
+import re
+import sys
+
+from . import models
+from .database import dialect_insert
+
+STORAGE_DIR = os.getenv("STORAGE_DIR", "uploads/objects")
+
+_FILE_ID_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def is_file_id(ref: Optional[str]) -> bool:
+    """True if `ref` is a content-addressed file id (not a legacy path)."""
+    return bool(ref) and bool(_FILE_ID_RE.match(ref))
+
+
+def object_path(file_id: str) -> str:
+    """Path of the stored object for a file id."""
+    return os.path.join(STORAGE_DIR, file_id[:2], file_id[2:4], file_id)
+
+
+def resolve_path(ref: Optional[str]) -> Optional[str]:
+    """Filesystem path for a file id, or a legacy uploads/ path as is."""
+    if not ref:
+        return None
+    return object_path(ref) if is_file_id(ref) else ref
+
+
+def exists(file_id: str) -> bool:
+    return os.path.exists(object_path(file_id))
+
+
+def put_file(temp_path: str, file_id: str) -> bool:
+    """
+    Move a fully written temporary file into the store under file_id
+
+    The temporary file must be on the same filesystem as STORAGE_DIR.
+
+    Returns:
+        True if the object was written, False if it was already stored
+    """
+    path = object_path(file_id)
+    if os.path.exists(path):
+        os.remove(temp_path)
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(temp_path, path)
+    return True
+
+
+def put_path(temp_path: str) -> str:
+    """Hash a fully written temporary file, move it into the store and return its file id."""
+    with open(temp_path, "rb") as f:
+        file_id = hashlib.file_digest(f, "sha256").hexdigest()
+    put_file(temp_path, file_id)
+    return file_id
+
+
+def put_bytes(data: bytes) -> str:
+    """Store bytes and return their file id (no write if already stored)."""
+    file_id = hashlib.sha256(data).hexdigest()
+    path = object_path(file_id)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.part"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    return file_id
+
+
+async def register_file(db: AsyncSession, file_id: str, size: int, mime_type: str) -> models.StoredFile:
+    """Record a stored object in the database if it is not known yet."""
+    result = await db.execute(select(models.StoredFile).where(models.StoredFile.file_id == file_id))
+    stored_file = result.scalars().first()
+    if not stored_file:
+        # Concurrent renders or uploads of the same content may race to insert it
+        await db.execute(
+            dialect_insert(db, models.StoredFile.__table__)
+            .values(file_id=file_id, size=size, mime_type=mime_type, ref_count=0, last_used_at=datetime.utcnow())
+            .on_conflict_do_nothing(index_elements=["file_id"])
+        )
+        result = await db.execute(select(models.StoredFile).where(models.StoredFile.file_id == file_id))
+        stored_file = result.scalars().one()
+    else:
+        # Keep re-uploaded files out of garbage collection for a while
+        stored_file.last_used_at = datetime.utcnow()
+    return stored_file
+
+
+async def add_reference(db: AsyncSession, file_id: str) -> bool:
+    """Increment the reference count of a stored file, False if it is unknown."""
+    result = await db.execute(
+        update(models.StoredFile)
+        .where(models.StoredFile.file_id == file_id)
+        .values(ref_count=models.StoredFile.ref_count + 1)
+    )
+    return result.rowcount == 1
+
+
+async def release_reference(db: AsyncSession, file_id: str):
+    """Decrement the reference count of a stored file."""
+    await db.execute(
+        update(models.StoredFile)
+        .where(models.StoredFile.file_id == file_id, models.StoredFile.ref_count > 0)
+        .values(ref_count=models.StoredFile.ref_count - 1, last_used_at=datetime.utcnow())
+    )
+
+
+async def collect_garbage(db: AsyncSession, max_age: timedelta) -> int:
+    """
+    Delete objects nobody references anymore
+
+    Only files unused for longer than max_age are removed, so an upload
+    waiting for its avenant to be submitted is left alone. The row is
+    deleted (and committed) before the object: a file referenced or
+    uploaded again since the SELECT keeps its row and its object.
+
+    Returns:
+        Number of deleted files
+    """
+    cutoff = datetime.utcnow() - max_age
+    result = await db.execute(
+        select(models.StoredFile.file_id).where(
+            models.StoredFile.ref_count == 0,
+            models.StoredFile.last_used_at < cutoff,
+        )
+    )
+    file_ids = result.scalars().all()
+
+    deleted = 0
+    for file_id in file_ids:
+        result = await db.execute(
+            delete(models.StoredFile).where(
+                models.StoredFile.file_id == file_id,
+                models.StoredFile.ref_count == 0,
+                models.StoredFile.last_used_at < cutoff,
+            )
+        )
+        await db.commit()
+        if result.rowcount != 1:
+            continue
+        path = object_path(file_id)
+        if os.path.exists(path):
+            os.remove(path)
+        deleted += 1
+    return deleted
+
+
+async def _main(argv):
+    from .database import AsyncSessionLocal
+
+    if not argv or argv[0] != "gc":
+        print(__doc__)
+        return 1
+
+    max_age_hours = float(argv[1]) if len(argv) > 1 else 24
+    async with AsyncSessionLocal() as db:
+        deleted = await collect_garbage(db, timedelta(hours=max_age_hours))
+    print(f"[STORAGE] Deleted {deleted} unreferenced file(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
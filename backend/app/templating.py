@@ -0,0 +1,72 @@
+"""
+Shared Jinja2 environment for PDF and email templates
+
+Templates live in app/templates and are compiled once per process. Compiled
+bytecode is also cached on disk so new processes (PDF render workers, extra
+uvicorn workers, restarts) skip the compile step too.
+"""
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache, select_autoescape
+from pathlib import Path
+from typing import Dict
+import logging
+import os
+import tempfile
+import threading
+import time
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+TEMPLATES_DIR = Path(__file__).resolve().parent / "templates"
+TEMPLATE_CACHE_DIR = os.getenv(
+    "TEMPLATE_CACHE_DIR", str(Path(tempfile.gettempdir()) / "chantierplus-jinja")
+)
+
+
+def _create_environment() -> Environment:
+    os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+    return Environment(
+        loader=FileSystemLoader(str(TEMPLATES_DIR)),
+        bytecode_cache=FileSystemBytecodeCache(TEMPLATE_CACHE_DIR),
+        autoescape=select_autoescape(["html"]),
+        # Templates ship with the code, no need to stat them on every render
+        auto_reload=False,
+    )
+
+
+env = _create_environment()
+
+_stats_lock = threading.Lock()
+_render_stats: Dict[str, Dict[str, float]] = {}
+
+
+def render_template(name: str, **context) -> str:
+    """Render a template by file name and record how long it took."""
+    start = time.perf_counter()
+    content = env.get_template(name).render(**context)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    with _stats_lock:
+        stats = _render_stats.setdefault(
+            name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0}
+        )
+        stats["count"] += 1
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+        stats["last_ms"] = elapsed_ms
+
+    logger.debug(f"[TEMPLATE] Rendered {name} in {elapsed_ms:.2f} ms")
+    return content
+
+
+def get_render_stats() -> Dict[str, Dict[str, float]]:
+    """Per-template render count, total, max and last render time in ms."""
+    with _stats_lock:
+        return {name: dict(stats) for name, stats in _render_stats.items()}
+
+
+def precompile_templates():
+    """Compile every template up front so the first request does not pay for it."""
+    for name in env.list_templates(extensions=["html"]):
+        env.get_template(name)
+    logger.info(f"[TEMPLATE] Precompiled templates from {TEMPLATES_DIR}")
@@ -0,0 +1,72 @@
+"""
+Tenant-scoped queries
+
+Chantiers and avenants belong to a company through chantiers.company_id.
+Instead of loading a row and then its chantier to compare company_id, the
+ownership check is part of the main query (Avenant JOIN Chantier WHERE
+company_id = :cid), so each lookup is a single round-trip. Rows of another
+company are indistinguishable from missing rows and get a 404.
+"""
+from uuid import UUID
+
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+from .principals import Principal
+
+
+def scoped_chantiers(principal: Principal, *entities):
+    """select() over chantiers of the principal's company (Chantier rows by default)."""
+    return select(*(entities or (models.Chantier,))).where(
+        models.Chantier.company_id == principal.company_id
+    )
+
+
+def scoped_avenants(principal: Principal, *entities):
+    """select() over avenants of the principal's company (Avenant rows by default)."""
+    return (
+        select(*(entities or (models.Avenant,)))
+        .select_from(models.Avenant)
+        .join(models.Chantier, models.Avenant.chantier_id == models.Chantier.id)
+        .where(models.Chantier.company_id == principal.company_id)
+    )
+
+
+async def get_chantier_or_404(db: AsyncSession, chantier_id: UUID, principal: Principal) -> models.Chantier:
+    result = await db.execute(
+        scoped_chantiers(principal).where(models.Chantier.id == chantier_id)
+    )
+    chantier = result.scalars().first()
+    if not chantier:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Chantier not found"
+        )
+    return chantier
+
+
+async def ensure_chantier_access(db: AsyncSession, chantier_id: UUID, principal: Principal):
+    """404 unless the chantier exists and belongs to the principal's company."""
+    result = await db.execute(
+        scoped_chantiers(principal, models.Chantier.id).where(models.Chantier.id == chantier_id)
+    )
+    if result.scalar() is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Chantier not found"
+        )
+
+
+async def get_avenant_or_404(db: AsyncSession, avenant_id: UUID, principal: Principal) -> models.Avenant:
+    result = await db.execute(
+        scoped_avenants(principal).where(models.Avenant.id == avenant_id)
+    )
+    avenant = result.scalars().first()
+    if not avenant:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Avenant not found"
+        )
+    return avenant
@@ -0,0 +1,112 @@
+"""
+Streaming upload handling
+
+Starlette parses a multipart body completely before the route handler
+runs, spooling file parts to a temporary file (in memory up to 1 MB). The
+size limit is therefore enforced before parsing, by UploadLimitMiddleware:
+a request whose Content-Length is over the route's limit is answered with
+413 without reading its body, and a body sent without Content-Length
+(chunked) is cut off as soon as it goes over the limit.
+
+stream_upload then copies the spooled part chunk by chunk to a temporary
+file inside the upload directory, hashing it and checking the file's own
+limit on the way. The part is thus written twice (spool, then upload
+directory), but memory use stays O(chunk size) whatever the file size.
+"""
+from fastapi import HTTPException, UploadFile, status
+from fastapi.responses import JSONResponse
+from typing import Dict, Tuple
+import asyncio
+import hashlib
+import os
+import tempfile
+
+UPLOAD_DIR = "uploads"
+UPLOAD_CHUNK_SIZE = 256 * 1024
+# Room for the multipart boundaries, part headers and text fields around the file
+MULTIPART_OVERHEAD = 256 * 1024
+
+TOO_LARGE_DETAIL = "Requête trop volumineuse"
+
+
+class UploadTooLargeError(Exception):
+    """Raised as soon as an upload goes over its size limit."""
+
+
+class UploadLimitMiddleware:
+    """
+    Reject request bodies over the limit of their route before they are parsed
+
+    `limits` maps a path to its maximum body size in bytes, other paths are
+    not checked.
+    """
+
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            response = JSONResponse(
+                {"detail": TOO_LARGE_DETAIL}, status_code=status.HTTP_413_CONTENT_TOO_LARGE
+            )
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside the body parsing, FastAPI turns it into the response
+                    raise HTTPException(
+                        status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail=TOO_LARGE_DETAIL
+                    )
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+async def stream_upload(
+    file: UploadFile, max_size: int, directory: str = UPLOAD_DIR
+) -> Tuple[str, int, str]:
+    """
+    Stream an uploaded file to a temporary file in `directory`
+
+    The temporary file is removed if the upload fails or is too large.
+
+    Returns:
+        Tuple (temp_path, size in bytes, SHA-256 hex digest)
+    """
+    # Reject early when the client announced the size
+    if file.size is not None and file.size > max_size:
+        raise UploadTooLargeError()
+
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+    digest = hashlib.sha256()
+    size = 0
+
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLargeError()
+                digest.update(chunk)
+                await asyncio.to_thread(out.write, chunk)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+    return temp_path, size, digest.hexdigest()
+
@@ -0,0 +1,95 @@
+"""
+Benchmark d'encodage JSON d'une page de 1000 avenants.
+
+Compare, sur les mêmes objets ORM :
+- l'ancien chemin (jsonable_encoder + json.dumps de la réponse par défaut),
+- le chemin response_model de FastAPI (validation Pydantic + dump_json),
+- rows_json (lecture directe des colonnes, orjson, sans validation),
+puis la taille et le coût de la compression gzip / brotli du corps.
+
+Usage: python bench_json.py [avenants] [répétitions]
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+import json
+import sys
+import time
+import uuid
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app import compression, models, schemas
+from app.responses import rows_json
+
+AVENANTS = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+REPEAT = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+
+def make_avenants(count: int) -> list:
+    chantier_id = uuid.uuid4()
+    now = datetime.utcnow()
+    return [
+        models.Avenant(
+            id=uuid.uuid4(),
+            chantier_id=chantier_id,
+            description=f"Travaux supplémentaires n°{i} : reprise d'enduit et peinture",
+            type="FORFAIT" if i % 2 else "REGIE",
+            price=Decimal("120.00"),
+            hours=None if i % 2 else Decimal("3.5"),
+            total_ht=Decimal("120.00") + i,
+            status="SIGNED",
+            signed_at=now - timedelta(minutes=i),
+            created_at=now - timedelta(minutes=i),
+            employee_id=uuid.uuid4(),
+        )
+        for i in range(count)
+    ]
+
+
+def timed(label: str, encode) -> bytes:
+    body = encode()
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        encode()
+    elapsed = (time.perf_counter() - start) / REPEAT * 1000
+    print(f"{label:<38} {elapsed:8.2f} ms  {len(body) / 1024:8.1f} Ko")
+    return body
+
+
+def main():
+    avenants = make_avenants(AVENANTS)
+    page = {"items": avenants, "next_cursor": None}
+    adapter = TypeAdapter(schemas.AvenantPage)
+
+    print("=" * 70)
+    print(f"BENCHMARK ENCODAGE JSON ({AVENANTS} avenants, moyenne sur {REPEAT} encodages)")
+    print("=" * 70)
+    legacy = timed(
+        "Avant (jsonable_encoder + json)",
+        lambda: json.dumps(
+            jsonable_encoder(adapter.validate_python(page)), separators=(",", ":")
+        ).encode(),
+    )
+    pydantic_body = timed(
+        "response_model (validation + Pydantic)",
+        lambda: adapter.dump_json(adapter.validate_python(page)),
+    )
+    fast = timed(
+        "rows_json (orjson, sans validation)",
+        lambda: rows_json(schemas.Avenant, avenants, extra={"next_cursor": None}).body,
+    )
+    same = json.loads(fast) == json.loads(pydantic_body) == json.loads(legacy)
+    print(f"Contenu identique aux deux autres chemins : {'oui' if same else 'NON'}")
+
+    print("-" * 70)
+    print(f"{'Compression':<38} {'temps':>11}  {'taille':>11}")
+    encodings = ["gzip"] + (["br"] if compression.brotli is not None else [])
+    for encoding in encodings:
+        timed(f"{encoding}", lambda: compression.compress(fast, encoding))
+    if compression.brotli is None:
+        print("brotli non installé, seul gzip est proposé")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark de débit des connexions (vérification bcrypt).
+
+Simule une rafale de connexions simultanées sur une seule boucle asyncio,
+comme en début de journée, et compare la vérification bcrypt synchrone
+(sur la boucle) à la vérification dans le pool de threads dédié. Mesure le
+débit et le retard maximal de la boucle (ce que subissent les autres requêtes).
+
+Usage: python bench_login.py [connexions_simultanées]
+"""
+import asyncio
+import sys
+import time
+
+from app.auth_utils import (
+    BCRYPT_ROUNDS,
+    PASSWORD_HASH_WORKERS,
+    get_password_hash,
+    pwd_context,
+    verify_and_update_password,
+)
+
+LOGINS = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+PASSWORD = "motdepasse-chantier"
+
+
+async def heartbeat(stop: asyncio.Event, lags: list):
+    """Tick every 10 ms and record how late each tick is."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append(time.perf_counter() - start - 0.01)
+
+
+async def login_sync(password_hash: str):
+    # Previous behaviour: bcrypt called directly inside the async handler
+    return pwd_context.verify(PASSWORD, password_hash)
+
+
+async def login_async(password_hash: str):
+    valid, _ = await verify_and_update_password(PASSWORD, password_hash)
+    return valid
+
+
+async def bench(label: str, login, password_hash: str):
+    stop = asyncio.Event()
+    lags: list = []
+    ticker = asyncio.create_task(heartbeat(stop, lags))
+    await asyncio.sleep(0.05)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(login(password_hash) for _ in range(LOGINS)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await ticker
+    assert all(results)
+    print(
+        f"{label:<22} {LOGINS / elapsed:8.1f} connexions/s   "
+        f"retard max boucle {max(lags) * 1000:8.1f} ms"
+    )
+
+
+async def main():
+    password_hash = get_password_hash(PASSWORD)
+
+    print("=" * 70)
+    print(f"BENCHMARK CONNEXIONS ({LOGINS} simultanées, bcrypt cost {BCRYPT_ROUNDS}, "
+          f"{PASSWORD_HASH_WORKERS} threads)")
+    print("=" * 70)
+    await bench("Avant (synchrone)", login_sync, password_hash)
+    await bench("Après (pool threads)", login_async, password_hash)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
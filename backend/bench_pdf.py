@@ -0,0 +1,108 @@
+"""
+Benchmark du rendu PDF des avenants.
+
+Compare le rendu "avant" (le generate_avenant_pdf d'origine, relu dans
+l'historique git : feuille de style inline re-parsée et polices
+reconstruites à chaque rendu) au rendu actuel (CSS et FontConfiguration
+partagés), sur un avenant texte seul et un avenant avec photo.
+
+Nécessite WeasyPrint avec Pango et un dépôt git complet.
+
+Usage: python bench_pdf.py [nombre_de_rendus]
+"""
+import importlib
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from PIL import Image
+
+from app.pdf_generator import generate_avenant_pdf
+
+RUNS = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+AVENANT = dict(
+    avenant_id="bench",
+    chantier_name="Rénovation appartement Dupont",
+    chantier_address="12 rue des Lilas, 75011 Paris",
+    description="Remplacement de la prise électrique du salon et ajout d'un circuit dédié. " * 5,
+    avenant_type="REGIE",
+    total_ht=540.0,
+    signature_path=None,
+    company_name="ChantierPlus Bench",
+    created_at="01/01/2025",
+    hours=12.0,
+    hourly_rate=45.0,
+)
+
+
+def make_photo(directory: str) -> str:
+    """Create a phone-camera sized photo (4032x3024 JPEG)."""
+    path = os.path.join(directory, "photo.jpg")
+    image = Image.effect_noise((4032, 3024), 64).convert("RGB")
+    image.save(path, "JPEG", quality=92)
+    return path
+
+
+def git(*args) -> bytes:
+    return subprocess.run(["git", *args], check=True, capture_output=True).stdout
+
+
+def load_baseline(directory: str):
+    """
+    Import the pdf_generator from before the stylesheet moved out of the
+    template, with the templating module and templates of that revision.
+    """
+    added = git("log", "--diff-filter=A", "--format=%h", "--", "app/templates/avenant_pdf.css")
+    revision = added.split()[-1].decode() + "^"
+    package = os.path.join(directory, "baseline_app")
+    os.makedirs(os.path.join(package, "templates"))
+    open(os.path.join(package, "__init__.py"), "w").close()
+    templates = git("ls-tree", "--name-only", revision, "app/templates/").decode().split()
+    for name in ["app/pdf_generator.py", "app/templating.py", *templates]:
+        with open(os.path.join(package, name.split("/", 1)[1]), "wb") as f:
+            f.write(git("show", f"{revision}:./{name}"))
+    sys.path.insert(0, directory)
+    return importlib.import_module("baseline_app.pdf_generator"), revision
+
+
+def render_before(photo_path, output_path):
+    # The original code always writes to uploads/{avenant_id}.pdf
+    baseline.generate_avenant_pdf(photo_path=photo_path, **AVENANT)
+
+
+def render_after(photo_path, output_path):
+    generate_avenant_pdf(photo_path=photo_path, output_path=output_path, **AVENANT)
+
+
+def bench(label, func, photo_path, output_path):
+    func(photo_path, output_path)  # Warm-up
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        func(photo_path, output_path)
+    per_render = (time.perf_counter() - start) / RUNS * 1000
+    print(f"{label:<32} {per_render:8.1f} ms/rendu")
+    return per_render
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline, revision = load_baseline(tmp)
+        photo_path = make_photo(tmp)
+        output_path = os.path.join(tmp, "after.pdf")
+
+        print("=" * 50)
+        print(f"BENCHMARK RENDU PDF ({RUNS} rendus par cas)")
+        print(f"Avant : generate_avenant_pdf de {revision}")
+        print("=" * 50)
+        for case, photo in (("texte seul", None), ("avec photo", photo_path)):
+            before = bench(f"Avant - {case}", render_before, photo, output_path)
+            after = bench(f"Après - {case}", render_after, photo, output_path)
+            print(f"{'Gain':<32} {(1 - after / before) * 100:8.1f} %")
+            print("-" * 50)
+
+    # The original generate_avenant_pdf writes to uploads/
+    if os.path.exists("uploads/bench.pdf"):
+        os.remove("uploads/bench.pdf")
@@ -0,0 +1,137 @@
+"""
+Benchmark d'écritures concurrentes sur SQLite.
+
+Plusieurs rédacteurs créent des avenants (avenant + job d'envoi, un commit
+chacun) pendant que des lecteurs listent les avenants d'un chantier, comme
+une équipe qui signe sur plusieurs chantiers en même temps. Compare le
+profil SQLite par défaut (journal rollback, synchronous=FULL) au profil de
+app.database (WAL, synchronous=NORMAL, mmap, cache, busy_timeout).
+
+Usage: python bench_sqlite.py [rédacteurs] [avenants_par_rédacteur] [lecteurs]
+"""
+from decimal import Decimal
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.database import apply_sqlite_pragmas, sqlite_pragmas
+from app.migrations import run_migrations
+
+WRITERS = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+AVENANTS_PER_WRITER = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+READERS = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+# Next to the real database: /tmp is often tmpfs, where fsync costs nothing
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def prepare_database(path: str):
+    """Migrate a fresh database and create one company with one chantier."""
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as connection:
+        run_migrations(connection)
+    with sessionmaker(engine)() as session:
+        company = models.Company(name="Bench")
+        session.add(company)
+        session.flush()
+        chantier = models.Chantier(
+            company_id=company.id, name="Chantier", address="1 rue", email="client@example.com"
+        )
+        session.add(chantier)
+        session.commit()
+        chantier_id = chantier.id
+    engine.dispose()
+    return chantier_id
+
+
+async def writer(Session, chantier_id, stats: dict):
+    for i in range(AVENANTS_PER_WRITER):
+        try:
+            async with Session() as db:
+                avenant = models.Avenant(
+                    chantier_id=chantier_id,
+                    description=f"Travaux supplémentaires {i}",
+                    type="QUOTE",
+                    price=Decimal("120.00"),
+                    total_ht=Decimal("120.00"),
+                    status="SIGNED",
+                )
+                db.add(avenant)
+                await db.flush()
+                db.add(models.AvenantDelivery(avenant_id=avenant.id, status="PENDING", attempts=0))
+                await db.commit()
+            stats["writes"] += 1
+        except OperationalError as e:
+            stats["errors"] += 1
+            stats["last_error"] = str(e.orig)
+
+
+async def reader(Session, chantier_id, stop: asyncio.Event, stats: dict):
+    while not stop.is_set():
+        try:
+            async with Session() as db:
+                result = await db.execute(
+                    select(models.Avenant)
+                    .where(models.Avenant.chantier_id == chantier_id)
+                    .order_by(models.Avenant.created_at.desc())
+                    .limit(50)
+                )
+                result.scalars().all()
+            stats["reads"] += 1
+        except OperationalError as e:
+            stats["errors"] += 1
+            stats["last_error"] = str(e.orig)
+        await asyncio.sleep(0)
+
+
+async def bench(label: str, pragmas: dict):
+    fd, path = tempfile.mkstemp(suffix=".db", dir=BENCH_DIR)
+    os.close(fd)
+    chantier_id = prepare_database(path)
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}", pool_size=WRITERS + READERS)
+    if pragmas:
+        apply_sqlite_pragmas(engine.sync_engine, pragmas)
+    Session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    stats = {"writes": 0, "reads": 0, "errors": 0, "last_error": None}
+    stop = asyncio.Event()
+    readers = [asyncio.create_task(reader(Session, chantier_id, stop, stats)) for _ in range(READERS)]
+
+    start = time.perf_counter()
+    await asyncio.gather(*(writer(Session, chantier_id, stats) for _ in range(WRITERS)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await asyncio.gather(*readers)
+    await engine.dispose()
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+    print(
+        f"{label:<24} {stats['writes'] / elapsed:8.1f} avenants/s  "
+        f"{stats['reads'] / elapsed:8.1f} lectures/s  {stats['errors']:4d} erreurs"
+    )
+    if stats["last_error"]:
+        print(f"{'':<24} dernière erreur : {stats['last_error']}")
+
+
+async def main():
+    print("=" * 78)
+    print(f"BENCHMARK SQLITE ({WRITERS} rédacteurs x {AVENANTS_PER_WRITER} avenants, {READERS} lecteurs)")
+    print("=" * 78)
+    await bench("Avant (défaut)", {})
+    await bench("Après (profil WAL)", sqlite_pragmas())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,352 @@
+"""
+Vérification de bout en bout de l'API.
+
+Démarre l'application (TestClient) sur une base temporaire, avec un serveur
+SMTP local (aiosmtpd) qui reçoit les emails, et déroule le parcours d'une
+entreprise : inscription, invitation d'un employé, chantiers, photo,
+avenants, envoi par email, résumé et cumuls, PDF et export ZIP. Contrôle
+ensuite que les cumuls tenus au fil de l'eau correspondent au recalcul
+complet (rollups.verify) et passe le ramasse-miettes du stockage.
+
+Base SQLite par défaut, PostgreSQL si DATABASE_URL y pointe (voir
+temporary_database.py). Nécessite toutes les dépendances de l'application,
+dont WeasyPrint avec Pango, et aiosmtpd (pip install aiosmtpd). La
+transcription (/api/transcribe) appelle OpenAI et n'est pas couverte.
+
+Usage: python check_api.py [port_smtp]
+       DATABASE_URL=postgresql+asyncpg://postgres@localhost/postgres python check_api.py
+"""
+from datetime import timedelta
+from decimal import Decimal
+from email import message_from_bytes, policy
+import base64
+import io
+import os
+import re
+import sys
+import tempfile
+import time
+import zipfile
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:
+    Controller = None
+
+from PIL import Image
+
+from temporary_database import create_temporary_database, describe, drop_temporary_database
+
+SMTP_HOST = "127.0.0.1"
+SMTP_PORT = int(sys.argv[1]) if len(sys.argv) > 1 else 8028
+DELIVERY_TIMEOUT = 120  # secondes, le premier rendu démarre le pool PDF
+
+OWNER = {"email": "patron@example.fr", "password": "motdepasse1", "company_name": "Entreprise Test"}
+EMPLOYEE = {"email": "employe@example.fr", "password": "motdepasse2"}
+CLIENT_EMAILS = ["client1@example.fr", "client2@example.fr", "client3@example.fr"]
+
+
+class MailRecorder:
+    """Garde chaque message reçu avec ses destinataires."""
+
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((list(envelope.rcpt_tos), message_from_bytes(envelope.content, policy=policy.default)))
+        return "250 OK"
+
+    def recipients(self) -> list:
+        return [recipient for recipients, _ in self.messages for recipient in recipients]
+
+
+def configure(database_url: str, directory: str):
+    """Variables lues par l'application à l'import : à fixer avant de l'importer."""
+    os.environ.update({
+        "DATABASE_URL": database_url,
+        "STORAGE_DIR": os.path.join(directory, "uploads", "objects"),
+        "SMTP_HOST": SMTP_HOST,
+        "SMTP_PORT": str(SMTP_PORT),
+        "SMTP_START_TLS": "false",
+        "SMTP_USERNAME": "",
+        "SMTP_PASSWORD": "",
+        "SMTP_FROM_EMAIL": "chantierplus@example.fr",
+        "DELIVERY_POLL_INTERVAL": "0.2",
+        # Plusieurs lectures du curseur de stream_rows pendant rollups.verify
+        "DB_STREAM_BATCH_SIZE": "2",
+    })
+    # Les fichiers envoyés vont dans uploads/ du répertoire courant
+    os.chdir(directory)
+
+
+def image_bytes(size, color, fmt) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, fmt)
+    return buffer.getvalue()
+
+
+def expect(problems: list, label: str, actual, expected):
+    if actual != expected:
+        problems.append(f"{label} : {actual!r} au lieu de {expected!r}")
+
+
+def checked(response, status_code=200):
+    if response.status_code != status_code:
+        raise AssertionError(
+            f"{response.request.method} {response.request.url.path} : "
+            f"{response.status_code} {response.text[:300]}"
+        )
+    return response
+
+
+def auth(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def check_accounts(client, state, mails) -> list:
+    problems = []
+    checked(client.post("/auth/register", json=OWNER))
+    login = checked(client.post("/auth/login", json={"email": OWNER["email"], "password": OWNER["password"]}))
+    state["owner"] = auth(login.json()["access_token"])
+    me = checked(client.get("/auth/me", headers=state["owner"])).json()
+    expect(problems, "rôle du créateur", me["role"], "OWNER")
+    state["company_id"] = me["company_id"]
+
+    checked(client.post("/auth/invite-employee", json={"email": EMPLOYEE["email"]}, headers=state["owner"]))
+    invitation = next(message for recipients, message in mails.messages if EMPLOYEE["email"] in recipients)
+    token = re.search(r"token=([\w-]+)", invitation.get_body(("html",)).get_content()).group(1)
+    activated = checked(client.post("/auth/activate", json={"token": token, "password": EMPLOYEE["password"]}))
+    state["employee"] = auth(activated.json()["access_token"])
+    employees = checked(client.get("/company/employees", headers=state["owner"])).json()
+    expect(problems, "comptes actifs", sorted(e["email"] for e in employees if e["is_active"]),
+           sorted([OWNER["email"], EMPLOYEE["email"]]))
+    return problems
+
+
+def check_chantiers(client, state, mails) -> list:
+    problems = []
+    state["chantiers"] = [
+        checked(client.post(
+            "/chantiers/",
+            json={"name": f"Chantier {number}", "address": f"{number} rue des Lilas", "email": email},
+            headers=state["owner"],
+        )).json()["id"]
+        for number, email in enumerate(CLIENT_EMAILS, 1)
+    ]
+    first = checked(client.get("/chantiers/?limit=2", headers=state["employee"])).json()
+    second = checked(client.get(
+        f"/chantiers/?limit=2&cursor={first['next_cursor']}", headers=state["employee"]
+    )).json()
+    # Plus récents d'abord
+    expect(problems, "pagination des chantiers",
+           [item["id"] for item in first["items"] + second["items"]], state["chantiers"][::-1])
+    expect(problems, "curseur de la dernière page", second["next_cursor"], None)
+    chantier = checked(client.get(f"/chantiers/{state['chantiers'][0]}", headers=state["employee"])).json()
+    expect(problems, "email du chantier", chantier["email"], CLIENT_EMAILS[0])
+    return problems
+
+
+def check_photo_upload(client, state, mails) -> list:
+    problems = []
+    photo = image_bytes((1600, 1200), (200, 80, 40), "JPEG")
+    uploads = [
+        checked(client.post("/avenants/files", files={"file": ("photo.jpg", photo, "image/jpeg")})).json()
+        for _ in range(2)
+    ]
+    expect(problems, "même photo envoyée deux fois", uploads[0]["photo_url"], uploads[1]["photo_url"])
+    state["photo"] = uploads[0]["photo_url"]
+    # Jamais rattachée à un avenant, pour le ramasse-miettes
+    orphan = image_bytes((800, 600), (20, 120, 220), "JPEG")
+    state["orphan"] = checked(client.post(
+        "/avenants/files", files={"file": ("orphan.jpg", orphan, "image/jpeg")}
+    )).json()["photo_url"]
+    return problems
+
+
+def check_avenants(client, state, mails) -> list:
+    problems = []
+    signature = image_bytes((300, 100), (255, 255, 255), "PNG")
+    first_chantier, second_chantier, _ = state["chantiers"]
+
+    forfait = checked(client.post("/avenants/", json={
+        "chantier_id": first_chantier, "description": "Ajout d'une prise", "type": "FORFAIT",
+        "price": "150.50", "photo_url": state["photo"],
+        "signature_data": "data:image/png;base64," + base64.b64encode(signature).decode(),
+    }, headers=state["employee"])).json()
+    regie = checked(client.post("/avenants/multipart", data={
+        "chantier_id": first_chantier, "description": "Reprise d'enduit", "type": "REGIE",
+        "hours": "3", "hourly_rate": "45",
+    }, files={"signature": ("signature.png", signature, "image/png")}, headers=state["employee"])).json()
+    other = checked(client.post("/avenants/", json={
+        "chantier_id": second_chantier, "description": "Peinture", "type": "FORFAIT", "price": "99.99",
+    }, headers=state["owner"])).json()
+
+    expect(problems, "total HT forfait", Decimal(forfait["total_ht"]), Decimal("150.50"))
+    expect(problems, "total HT régie", Decimal(regie["total_ht"]), Decimal("135"))
+    state["avenants"] = {first_chantier: [forfait["id"], regie["id"]], second_chantier: [other["id"]]}
+
+    page = checked(client.get(f"/chantiers/{first_chantier}/avenants?limit=1", headers=state["owner"])).json()
+    rest = checked(client.get(
+        f"/chantiers/{first_chantier}/avenants?limit=1&cursor={page['next_cursor']}", headers=state["owner"]
+    )).json()
+    expect(problems, "pagination des avenants",
+           [item["id"] for item in page["items"] + rest["items"]], [regie["id"], forfait["id"]])
+    return problems
+
+
+def check_delivery(client, state, mails) -> list:
+    problems = []
+    avenant_ids = [avenant_id for ids in state["avenants"].values() for avenant_id in ids]
+    deadline = time.monotonic() + DELIVERY_TIMEOUT
+    while True:
+        deliveries = [
+            checked(client.get(f"/avenants/{avenant_id}/delivery", headers=state["owner"])).json()
+            for avenant_id in avenant_ids
+        ]
+        if all(d["status"] in ("SENT", "FAILED") for d in deliveries) or time.monotonic() > deadline:
+            break
+        time.sleep(0.5)
+    for delivery in deliveries:
+        expect(problems, f"envoi de {delivery['avenant_id']}", (delivery["status"], delivery["last_error"]), ("SENT", None))
+
+    recipients = mails.recipients()
+    for email, count in ((CLIENT_EMAILS[0], 2), (CLIENT_EMAILS[1], 1), (OWNER["email"], 3), (EMPLOYEE["email"], 3)):
+        # L'employé a aussi reçu son invitation
+        expect(problems, f"emails reçus par {email}", recipients.count(email), count)
+    return problems
+
+
+def check_summary_and_rollups(client, state, mails) -> list:
+    problems = []
+    first_chantier, second_chantier, third_chantier = state["chantiers"]
+    expected = {
+        first_chantier: (2, Decimal("285.50")),
+        second_chantier: (1, Decimal("99.99")),
+        third_chantier: (0, Decimal("0")),
+    }
+    summary = checked(client.get("/chantiers/summary", headers=state["owner"])).json()
+    expect(problems, "résumé des chantiers",
+           {item["id"]: (item["avenant_count"], Decimal(item["signed_total_ht"])) for item in summary["items"]},
+           expected)
+
+    rollup = checked(client.get(f"/chantiers/{first_chantier}/rollup", headers=state["owner"])).json()
+    expect(problems, "cumul du chantier",
+           (rollup["forfait_count"], rollup["regie_count"], rollup["sent_count"], Decimal(rollup["regie_total_ht"])),
+           (1, 1, 2, Decimal("135")))
+    rollup = checked(client.get("/company/rollup", headers=state["owner"])).json()
+    expect(problems, "cumul de l'entreprise",
+           (rollup["forfait_count"], rollup["sent_count"], Decimal(rollup["forfait_total_ht"])),
+           (2, 3, Decimal("250.49")))
+    return problems
+
+
+def check_documents(client, state, mails) -> list:
+    problems = []
+    first_chantier = state["chantiers"][0]
+    avenant_id = state["avenants"][first_chantier][0]
+    pdf = checked(client.get(f"/avenants/{avenant_id}/pdf", headers=state["owner"]))
+    expect(problems, "début du PDF", pdf.content[:5], b"%PDF-")
+    cached = client.get(
+        f"/avenants/{avenant_id}/pdf", headers={**state["owner"], "If-None-Match": pdf.headers["etag"]}
+    )
+    expect(problems, "PDF inchangé (If-None-Match)", cached.status_code, 304)
+
+    export = checked(client.get(f"/chantiers/{first_chantier}/avenants/export.zip", headers=state["owner"]))
+    archive = zipfile.ZipFile(io.BytesIO(export.content))
+    expect(problems, "fichiers de l'export", len(archive.namelist()), 2)
+    expect(problems, "archive intacte", archive.testzip(), None)
+    return problems
+
+
+def check_recomputed_rollups(client, state, mails) -> list:
+    from app import rollups
+    from app.database import AsyncSessionLocal
+
+    async def verify():
+        async with AsyncSessionLocal() as db:
+            return await rollups.verify(db)
+
+    return [f"{table} {key} : {drift}" for table, key, drift in client.portal.call(verify)]
+
+
+def check_garbage_collection(client, state, mails) -> list:
+    from app import storage
+    from app.database import AsyncSessionLocal
+
+    async def collect():
+        async with AsyncSessionLocal() as db:
+            return await storage.collect_garbage(db, max_age=timedelta(0))
+
+    problems = []
+    expect(problems, "fichiers supprimés", client.portal.call(collect), 1)
+    expect(problems, "photo orpheline supprimée", storage.exists(state["orphan"]), False)
+    expect(problems, "photo d'avenant conservée", storage.exists(state["photo"]), True)
+    return problems
+
+
+# Chaque étape reprend l'état laissé par les précédentes
+CHECKS = [
+    ("inscription, invitation et connexion", check_accounts),
+    ("chantiers et pagination", check_chantiers),
+    ("envoi de photo dédupliqué", check_photo_upload),
+    ("création d'avenants (JSON et multipart)", check_avenants),
+    ("envoi des avenants par email", check_delivery),
+    ("résumé des chantiers et cumuls", check_summary_and_rollups),
+    ("PDF et export ZIP", check_documents),
+    ("cumuls recalculés (rollups.verify)", check_recomputed_rollups),
+    ("ramasse-miettes du stockage", check_garbage_collection),
+]
+
+
+def run_checks() -> int:
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    mails = MailRecorder()
+    controller = Controller(mails, hostname=SMTP_HOST, port=SMTP_PORT)
+    controller.start()
+    failures = 0
+    state = {}
+    try:
+        with TestClient(app) as client:
+            for name, check in CHECKS:
+                try:
+                    problems = check(client, state, mails)
+                except Exception as e:
+                    problems = [f"{type(e).__name__}: {e}"]
+                status = "OK" if not problems else "ÉCHEC"
+                print(f"[{status}] {name}")
+                for problem in problems:
+                    print(f"    {problem}")
+                failures += bool(problems)
+    finally:
+        controller.stop()
+
+    if failures:
+        print(f"{failures} vérification(s) en échec")
+        return 1
+    return 0
+
+
+def main() -> int:
+    if Controller is None:
+        print("aiosmtpd non installé : pip install aiosmtpd")
+        return 1
+
+    print(f"Base : {describe()}")
+    database_url = create_temporary_database()
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            configure(database_url, directory)
+            try:
+                return run_checks()
+            finally:
+                os.chdir(cwd)
+    finally:
+        drop_temporary_database(database_url)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""
+Vérification du chemin de mise à jour du schéma.
+
+Avant les migrations Alembic, le schéma était créé par create_all au
+démarrage. Ce script reconstruit, sur des bases temporaires, le
+schéma laissé par chacune de ces versions (avec un utilisateur
+existant), lance run_migrations comme au démarrage, puis
+compare le résultat aux modèles. Échoue (code 1) s'il manque une table,
+une colonne ou un index : un changement de modèle est arrivé sans sa
+migration.
+
+Bases SQLite par défaut, PostgreSQL si DATABASE_URL y pointe (voir
+temporary_database.py).
+
+Usage: python check_migrations.py
+       DATABASE_URL=postgresql+asyncpg://postgres@localhost/postgres python check_migrations.py
+"""
+import asyncio
+import sys
+
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app import models  # Import models to register them with SQLAlchemy
+from app.database import Base
+from app.migrations import get_config, run_migrations
+from temporary_database import create_temporary_database, describe, drop_temporary_database
+
+# (nom, révision équivalente au schéma create_all, instructions pour le retrouver)
+SHAPES = [
+    ("nouvelle base", None, []),
+    ("create_all initial", "0001", []),
+    (
+        "create_all avec avenant_deliveries",
+        "0002",
+        [
+            "DROP TABLE stored_files",
+            "ALTER TABLE user_profiles DROP COLUMN token_version",
+        ],
+    ),
+    (
+        "create_all avec stored_files",
+        "0002",
+        ["ALTER TABLE user_profiles DROP COLUMN token_version"],
+    ),
+    ("create_all avec token_version", "0002", []),
+]
+
+COMPANY_ID = "11111111111111111111111111111111"
+USER_ID = "22222222222222222222222222222222"
+
+
+def build_shape(connection, revision, statements):
+    """Schéma laissé par create_all : tables de la révision, sans alembic_version."""
+    command.upgrade(get_config(connection), revision)
+    for statement in statements:
+        connection.execute(text(statement))
+    connection.execute(text("DROP TABLE alembic_version"))
+    connection.execute(text(f"INSERT INTO companies (id, name) VALUES ('{COMPANY_ID}', 'Entreprise')"))
+    connection.execute(text(
+        "INSERT INTO user_profiles (id, company_id, email, role, is_active) "
+        f"VALUES ('{USER_ID}', '{COMPANY_ID}', 'patron@example.fr', 'OWNER', TRUE)"
+    ))
+
+
+def schema_differences(connection) -> list:
+    # Types comparés sur PostgreSQL seulement : SQLite relit les UUID comme NUMERIC
+    context = MigrationContext.configure(
+        connection, opts={"compare_type": connection.dialect.name != "sqlite"}
+    )
+    return compare_metadata(context, Base.metadata)
+
+
+def shape_problems(connection, revision) -> list:
+    problems = [str(difference) for difference in schema_differences(connection)]
+    if revision:
+        token_version = connection.execute(
+            text(f"SELECT token_version FROM user_profiles WHERE id = '{USER_ID}'")
+        ).scalar()
+        if token_version != 0:
+            problems.append(f"token_version de l'utilisateur existant : {token_version!r}")
+    return problems
+
+
+async def check_shape(database_url, revision, statements) -> list:
+    engine = create_async_engine(database_url, poolclass=NullPool)
+    try:
+        if revision:
+            async with engine.begin() as connection:
+                await connection.run_sync(build_shape, revision, statements)
+
+        async with engine.begin() as connection:
+            await connection.run_sync(run_migrations)
+
+        async with engine.connect() as connection:
+            return await connection.run_sync(shape_problems, revision)
+    finally:
+        await engine.dispose()
+
+
+def main() -> int:
+    print(f"Bases : {describe()}")
+    failures = 0
+    for name, revision, statements in SHAPES:
+        database_url = create_temporary_database()
+        try:
+            problems = asyncio.run(check_shape(database_url, revision, statements))
+        except Exception as e:
+            problems = [f"{type(e).__name__}: {e}"]
+        finally:
+            drop_temporary_database(database_url)
+        status = "OK" if not problems else "ÉCHEC"
+        print(f"[{status}] {name}")
+        for problem in problems:
+            print(f"    {problem}")
+        failures += bool(problems)
+
+    if failures:
+        print(f"{failures} schéma(s) sans chemin de mise à jour")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""
+Vérification des plans de requête des chemins critiques.
+
+Applique les migrations sur une base temporaire puis lance EXPLAIN sur
+les requêtes les plus fréquentes, construites par les mêmes fonctions que
+les routes et le worker (filtre par entreprise, sélection de colonnes,
+pagination par curseur). Échoue (code 1) si l'une d'elles parcourt une
+table entière ou trie en mémoire : un index a disparu ou la requête a
+changé.
+
+Base SQLite par défaut (EXPLAIN QUERY PLAN : SCAN, USE TEMP B-TREE FOR
+ORDER BY), PostgreSQL si DATABASE_URL y pointe (voir
+temporary_database.py). Les tables y étant vides, Seq Scan et Sort sont
+désactivés pour le planificateur : s'il les garde, aucun index ne convient.
+
+Usage: python check_query_plans.py
+       DATABASE_URL=postgresql+asyncpg://postgres@localhost/postgres python check_query_plans.py
+"""
+from datetime import datetime
+import asyncio
+import sys
+import uuid
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app import models, schemas
+from app.avenant_documents import export_batch_statement
+from app.delivery import DELIVERY_BATCH_SIZE, due_jobs_statement, owner_emails_statement
+from app.field_selection import requested_fields
+from app.migrations import run_migrations
+from app.pagination import DEFAULT_PAGE_SIZE, page_statement
+from app.principals import Principal
+from app.routers.chantiers import (
+    chantier_avenants_statement,
+    chantiers_statement,
+    chantiers_summary_statement,
+)
+from temporary_database import create_temporary_database, describe, drop_temporary_database
+
+PRINCIPAL = Principal(id=uuid.uuid4(), company_id=uuid.uuid4(), role="OWNER", is_active=True, token_version=0)
+# Position d'un curseur de pagination (page suivante)
+POSITION = (datetime(2025, 1, 1, 12, 0, 0), uuid.uuid4())
+
+CHANTIER_FIELDS = requested_fields(schemas.Chantier, schemas.ChantierListItem, None)
+AVENANT_FIELDS = requested_fields(schemas.Avenant, schemas.AvenantListItem, None)
+
+# (nom, requête, tri en mémoire accepté)
+# Le polling du worker lit au plus DELIVERY_BATCH_SIZE lignes dues et le
+# résumé regroupe les chantiers d'une seule entreprise : le tri de ces petits
+# résultats est acceptable, pas le parcours de toute la table.
+QUERIES = [
+    (
+        "read_chantiers",
+        page_statement(
+            chantiers_statement(PRINCIPAL, CHANTIER_FIELDS), models.Chantier, POSITION, DEFAULT_PAGE_SIZE
+        ),
+        False,
+    ),
+    (
+        "get_chantier_avenants",
+        page_statement(
+            chantier_avenants_statement(PRINCIPAL, uuid.uuid4(), AVENANT_FIELDS),
+            models.Avenant, POSITION, DEFAULT_PAGE_SIZE,
+        ),
+        False,
+    ),
+    (
+        "export_signed_avenants",
+        export_batch_statement(uuid.uuid4(), POSITION),
+        False,
+    ),
+    (
+        "chantiers_summary",
+        page_statement(
+            chantiers_summary_statement(PRINCIPAL), models.Chantier, POSITION, DEFAULT_PAGE_SIZE
+        ),
+        True,
+    ),
+    (
+        "owner_lookup",
+        owner_emails_statement(uuid.uuid4()),
+        False,
+    ),
+    (
+        "delivery_polling",
+        due_jobs_statement(DELIVERY_BATCH_SIZE),
+        True,
+    ),
+]
+
+
+def plan_problems(details: list, allow_sort: bool) -> list:
+    problems = []
+    for detail in details:
+        # "SCAN t USING INDEX ..." / "SCAN t USING COVERING INDEX ..." are index scans
+        if detail.startswith("SCAN ") and "USING" not in detail:
+            problems.append(detail)
+        if "USE TEMP B-TREE FOR ORDER BY" in detail and not allow_sort:
+            problems.append(detail)
+    return problems
+
+
+def postgres_plan_problems(details: list, allow_sort: bool) -> list:
+    problems = []
+    for detail in details:
+        node = detail.strip().removeprefix("->").strip()
+        if node.startswith("Seq Scan"):
+            problems.append(detail)
+        # Incremental Sort: the index only gives part of the order
+        if node.startswith(("Sort", "Incremental Sort")) and not allow_sort:
+            problems.append(detail)
+    return problems
+
+
+def explain(connection, statement) -> list:
+    compiled = statement.compile(connection, compile_kwargs={"literal_binds": True})
+    if connection.dialect.name == "sqlite":
+        rows = connection.execute(text(f"EXPLAIN QUERY PLAN {compiled}")).all()
+        return [row[-1] for row in rows]
+    return [row[0] for row in connection.execute(text(f"EXPLAIN {compiled}")).all()]
+
+
+def check_plans(connection) -> int:
+    if connection.dialect.name == "sqlite":
+        problems_of = plan_problems
+    else:
+        problems_of = postgres_plan_problems
+        connection.execute(text("SET enable_seqscan = off"))
+        connection.execute(text("SET enable_sort = off"))
+
+    failures = 0
+    for name, statement, allow_sort in QUERIES:
+        details = explain(connection, statement)
+        problems = problems_of(details, allow_sort)
+        status = "OK" if not problems else "ÉCHEC"
+        print(f"[{status}] {name}")
+        for detail in details:
+            print(f"    {detail}")
+        failures += bool(problems)
+    return failures
+
+
+async def run_checks(database_url) -> int:
+    engine = create_async_engine(database_url, poolclass=NullPool)
+    try:
+        async with engine.begin() as connection:
+            await connection.run_sync(run_migrations)
+
+        async with engine.connect() as connection:
+            return await connection.run_sync(check_plans)
+    finally:
+        await engine.dispose()
+
+
+def main() -> int:
+    print(f"Base : {describe()}")
+    database_url = create_temporary_database()
+    try:
+        failures = asyncio.run(run_checks(database_url))
+    finally:
+        drop_temporary_database(database_url)
+
+    if failures:
+        print(f"{failures} requête(s) sans index adapté")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
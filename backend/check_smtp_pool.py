@@ -0,0 +1,197 @@
+"""
+Vérification du pool de connexions SMTP (app.smtp_pool) contre un serveur
+SMTP local (aiosmtpd).
+
+Contrôle que :
+- plusieurs envois successifs réutilisent la même connexion,
+- une connexion inactive est vérifiée par NOOP avant d'être réutilisée,
+- l'envoi réussit sur une nouvelle connexion quand le serveur a redémarré
+  entre deux envois,
+- un envoi interrompu par la coupure d'une connexion qui semblait saine est
+  renvoyé une fois sur une nouvelle connexion.
+
+Nécessite aiosmtpd (pip install aiosmtpd), qui ne fait pas partie des
+dépendances de l'application.
+
+Usage: python check_smtp_pool.py [port]
+"""
+from email.message import EmailMessage
+import asyncio
+import sys
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:
+    Controller = None
+
+from app.smtp_pool import SMTPConnectionPool
+
+HOST = "127.0.0.1"
+PORT = int(sys.argv[1]) if len(sys.argv) > 1 else 8027
+
+
+class RecordingHandler:
+    """Compte les messages, les NOOP et les connexions ayant envoyé un message."""
+
+    def __init__(self):
+        self.messages = 0
+        self.noops = 0
+        self.connections = set()
+        self.drop_next_mail = False
+
+    async def handle_NOOP(self, server, session, envelope, arg):
+        self.noops += 1
+        return "250 OK"
+
+    async def handle_MAIL(self, server, session, envelope, address, mail_options):
+        if self.drop_next_mail:
+            # Coupure sans réponse, comme une connexion morte côté serveur
+            self.drop_next_mail = False
+            server.transport.close()
+            return "421 Service not available"
+        envelope.mail_from = address
+        envelope.mail_options.extend(mail_options)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages += 1
+        self.connections.add(session.peer)
+        return "250 OK"
+
+
+def make_message(number: int) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = "chantierplus@example.fr"
+    message["To"] = "client@example.fr"
+    message["Subject"] = f"Test pool SMTP {number}"
+    message.set_content("Message de test")
+    return message
+
+
+def make_pool(health_check_after: float) -> SMTPConnectionPool:
+    return SMTPConnectionPool(
+        hostname=HOST,
+        port=PORT,
+        start_tls=False,
+        max_size=1,
+        health_check_after=health_check_after,
+        timeout=5,
+    )
+
+
+def start_server(handler: RecordingHandler) -> Controller:
+    controller = Controller(handler, hostname=HOST, port=PORT)
+    controller.start()
+    return controller
+
+
+async def check_reuse(handler: RecordingHandler, restart_server) -> list:
+    pool = make_pool(health_check_after=60)
+    try:
+        for number in range(3):
+            await pool.send_message(make_message(number))
+    finally:
+        await pool.close()
+    problems = []
+    if handler.messages != 3:
+        problems.append(f"{handler.messages} message(s) reçu(s) sur 3")
+    if len(handler.connections) != 1:
+        problems.append(f"{len(handler.connections)} connexions ouvertes au lieu d'une")
+    return problems
+
+
+async def check_noop(handler: RecordingHandler, restart_server) -> list:
+    pool = make_pool(health_check_after=0)
+    try:
+        await pool.send_message(make_message(1))
+        await asyncio.sleep(0.1)
+        await pool.send_message(make_message(2))
+    finally:
+        await pool.close()
+    problems = []
+    if handler.noops < 1:
+        problems.append("aucun NOOP avant la réutilisation")
+    if len(handler.connections) != 1:
+        problems.append(f"{len(handler.connections)} connexions ouvertes au lieu d'une")
+    return problems
+
+
+def reconnect_problems(handler: RecordingHandler) -> list:
+    problems = []
+    if handler.messages != 2:
+        problems.append(f"{handler.messages} message(s) reçu(s) sur 2")
+    if len(handler.connections) != 2:
+        problems.append(f"{len(handler.connections)} connexion(s) au lieu d'une nouvelle après la coupure")
+    return problems
+
+
+async def check_restart(handler: RecordingHandler, restart_server) -> list:
+    pool = make_pool(health_check_after=0)
+    try:
+        await pool.send_message(make_message(1))
+        # Le redémarrage coupe la connexion inactive du pool
+        restart_server()
+        await asyncio.sleep(0.1)
+        await pool.send_message(make_message(2))
+    finally:
+        await pool.close()
+    return reconnect_problems(handler)
+
+
+async def check_drop_during_send(handler: RecordingHandler, restart_server) -> list:
+    pool = make_pool(health_check_after=60)
+    try:
+        await pool.send_message(make_message(1))
+        handler.drop_next_mail = True
+        await pool.send_message(make_message(2))
+    finally:
+        await pool.close()
+    return reconnect_problems(handler)
+
+
+CHECKS = [
+    ("réutilisation de la connexion", check_reuse),
+    ("contrôle NOOP avant réutilisation", check_noop),
+    ("serveur redémarré entre deux envois", check_restart),
+    ("connexion coupée pendant l'envoi", check_drop_during_send),
+]
+
+
+async def run_checks() -> int:
+    failures = 0
+    for name, check in CHECKS:
+        handler = RecordingHandler()
+        controllers = [start_server(handler)]
+
+        def restart_server():
+            # Un Controller arrêté ne redémarre pas, le même handler passe au suivant
+            controllers[-1].stop()
+            controllers.append(start_server(handler))
+
+        try:
+            problems = await check(handler, restart_server)
+        except Exception as e:
+            problems = [f"{type(e).__name__}: {e}"]
+        finally:
+            controllers[-1].stop()
+        status = "OK" if not problems else "ÉCHEC"
+        print(f"[{status}] {name}")
+        for problem in problems:
+            print(f"    {problem}")
+        failures += bool(problems)
+
+    if failures:
+        print(f"{failures} vérification(s) en échec")
+        return 1
+    return 0
+
+
+def main() -> int:
+    if Controller is None:
+        print("aiosmtpd non installé : pip install aiosmtpd")
+        return 1
+    return asyncio.run(run_checks())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""
+Bases de données jetables pour les scripts de vérification.
+
+Par défaut, un fichier SQLite temporaire. Si DATABASE_URL pointe sur
+PostgreSQL (postgresql+asyncpg://...), une base vide est créée sur ce
+serveur à côté de celle de l'URL, qui n'est pas modifiée, puis supprimée
+à la fin. L'utilisateur doit avoir le droit CREATEDB.
+"""
+import asyncio
+import os
+import tempfile
+import uuid
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+# Lue à l'import : check_api.py remplace ensuite DATABASE_URL par la base temporaire
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+
+def server_url():
+    """URL PostgreSQL de DATABASE_URL, None pour SQLite."""
+    if DATABASE_URL and make_url(DATABASE_URL).get_backend_name() == "postgresql":
+        return make_url(DATABASE_URL)
+    return None
+
+
+async def _execute_on_server(url, statement: str):
+    # CREATE/DROP DATABASE ne passent pas dans une transaction
+    engine = create_async_engine(url, isolation_level="AUTOCOMMIT", poolclass=NullPool)
+    try:
+        async with engine.connect() as connection:
+            await connection.execute(text(statement))
+    finally:
+        await engine.dispose()
+
+
+def create_temporary_database() -> str:
+    """Crée une base vide et renvoie son URL (pilote async)."""
+    url = server_url()
+    if url is None:
+        fd, db_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        return f"sqlite+aiosqlite:///{db_path}"
+
+    name = f"{url.database}_check_{uuid.uuid4().hex[:8]}"
+    asyncio.run(_execute_on_server(url, f'CREATE DATABASE "{name}"'))
+    return url.set(database=name).render_as_string(hide_password=False)
+
+
+def drop_temporary_database(database_url: str):
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite":
+        os.remove(url.database)
+        return
+    # FORCE ferme les connexions restées ouvertes (PostgreSQL 13+)
+    asyncio.run(_execute_on_server(server_url(), f'DROP DATABASE "{url.database}" WITH (FORCE)'))
+
+
+def describe() -> str:
+    url = server_url()
+    if url is None:
+        return "SQLite (fichier temporaire)"
+    return f"PostgreSQL ({url.render_as_string(hide_password=True)})"
@@ -22,7 +22,7 @@ print(f"SMTP_FROM_NAME: {os.getenv('SMTP_FROM_NAME')}")
 print("=" * 50)
 
 # Import after loading env
-from app.email import send_email
+from app.email import send_email, smtp_pool
 
 async def test_send_email():
     """Send a test email"""
@@ -55,6 +55,8 @@ async def test_send_email():
         print(f"\n❌ Erreur lors de l'envoi: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        await smtp_pool.close()
 
 if __name__ == "__main__":
     asyncio.run(test_send_email())
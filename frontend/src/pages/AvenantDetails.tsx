@@ -1,13 +1,14 @@
 import React, { useEffect, useState } from 'react';
 import { useParams, Link } from 'react-router-dom';
 import axios from 'axios';
-import { CheckCircle, ArrowLeft } from 'lucide-react';
+import { CheckCircle, ArrowLeft, Download } from 'lucide-react';
 import API_URL from '../config';
 
 const AvenantDetails: React.FC = () => {
     const { id } = useParams<{ id: string }>();
     const [avenant, setAvenant] = useState<any>(null);
     const [loading, setLoading] = useState(true);
+    const [downloading, setDownloading] = useState(false);
 
     useEffect(() => {
         const fetchAvenant = async () => {
@@ -29,6 +30,27 @@ const AvenantDetails: React.FC = () => {
         fetchAvenant();
     }, [id]);
 
+    const openPdf = async () => {
+        try {
+            setDownloading(true);
+            const token = localStorage.getItem('token');
+            // v = current PDF version: the browser cache can keep it for good
+            const response = await axios.get(`${API_URL}/avenants/${id}/pdf`, {
+                headers: { Authorization: `Bearer ${token}` },
+                params: avenant?.pdf_file_id ? { v: avenant.pdf_file_id } : {},
+                responseType: 'blob'
+            });
+            const url = URL.createObjectURL(response.data);
+            window.open(url, '_blank');
+            setTimeout(() => URL.revokeObjectURL(url), 60000);
+        } catch (error) {
+            console.error("Error downloading PDF:", error);
+            alert("Impossible de récupérer le PDF de l'avenant");
+        } finally {
+            setDownloading(false);
+        }
+    };
+
     if (loading) return <p>Chargement...</p>;
 
     return (
@@ -53,6 +75,15 @@ const AvenantDetails: React.FC = () => {
                 </p>
             </div>
 
+            <button
+                onClick={openPdf}
+                disabled={downloading}
+                className="inline-flex items-center gap-2 bg-blue-600 text-white px-4 py-2 rounded-lg hover:bg-blue-700 transition disabled:opacity-50"
+            >
+                <Download size={18} />
+                {downloading ? 'Chargement du PDF...' : 'Voir le PDF'}
+            </button>
+
             <div className="pt-6">
                 <Link
                     to={avenant?.chantier_id ? `/chantier/${avenant.chantier_id}` : "/"}
@@ -1,7 +1,7 @@
 import React, { useEffect, useState } from 'react';
 import { useParams, useNavigate, Link } from 'react-router-dom';
 import axios from 'axios';
-import { ArrowLeft, Plus, FileText, Calendar, Euro, Clock } from 'lucide-react';
+import { ArrowLeft, Plus, FileText, Calendar, Euro, Clock, Download } from 'lucide-react';
 import { API_BASE_URL } from '../config';
 
 interface Avenant {
@@ -10,10 +10,12 @@ interface Avenant {
     type: string;
     total_ht: number | string;  // Can be string from JSON numeric
     status: string;
-    signed_at: string | null;
     created_at: string;
 }
 
+// Only what the list shows, the API skips the other columns
+const AVENANT_LIST_FIELDS = 'id,description,type,total_ht,status,created_at';
+
 interface Chantier {
     id: string;
     name: string;
@@ -27,7 +29,10 @@ const ChantierDetails: React.FC = () => {
     const navigate = useNavigate();
     const [chantier, setChantier] = useState<Chantier | null>(null);
     const [avenants, setAvenants] = useState<Avenant[]>([]);
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
+    const [exporting, setExporting] = useState(false);
     const [loading, setLoading] = useState(true);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [error, setError] = useState<string | null>(null);
 
     useEffect(() => {
@@ -49,12 +54,14 @@ const ChantierDetails: React.FC = () => {
                     headers: { Authorization: `Bearer ${token}` }
                 }),
                 axios.get(`${API_BASE_URL}/chantiers/${chantierId}/avenants`, {
-                    headers: { Authorization: `Bearer ${token}` }
+                    headers: { Authorization: `Bearer ${token}` },
+                    params: { fields: AVENANT_LIST_FIELDS }
                 })
             ]);
 
             setChantier(chantierRes.data);
-            setAvenants(avenantsRes.data);
+            setAvenants(avenantsRes.data.items);
+            setNextCursor(avenantsRes.data.next_cursor);
         } catch (error: any) {
             console.error("Error fetching data:", error);
             console.error("Error response:", error.response?.data);
@@ -64,6 +71,46 @@ const ChantierDetails: React.FC = () => {
         }
     };
 
+    const fetchMoreAvenants = async () => {
+        if (!nextCursor) return;
+        try {
+            setLoadingMore(true);
+            const token = localStorage.getItem('token');
+            const response = await axios.get(`${API_BASE_URL}/chantiers/${chantierId}/avenants`, {
+                headers: { Authorization: `Bearer ${token}` },
+                params: { cursor: nextCursor, fields: AVENANT_LIST_FIELDS }
+            });
+            setAvenants((previous) => [...previous, ...response.data.items]);
+            setNextCursor(response.data.next_cursor);
+        } catch (error: any) {
+            console.error("Error fetching avenants:", error);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
+    const exportAvenants = async () => {
+        try {
+            setExporting(true);
+            const token = localStorage.getItem('token');
+            const response = await axios.get(`${API_BASE_URL}/chantiers/${chantierId}/avenants/export.zip`, {
+                headers: { Authorization: `Bearer ${token}` },
+                responseType: 'blob'
+            });
+            const url = URL.createObjectURL(response.data);
+            const link = document.createElement('a');
+            link.href = url;
+            link.download = `avenants_${chantier?.name ?? chantierId}.zip`;
+            link.click();
+            URL.revokeObjectURL(url);
+        } catch (error: any) {
+            console.error("Error exporting avenants:", error);
+            alert("Impossible d'exporter les avenants");
+        } finally {
+            setExporting(false);
+        }
+    };
+
     const getStatusBadge = (status: string) => {
         const badges: Record<string, { bg: string; text: string; label: string }> = {
             DRAFT: { bg: 'bg-gray-100', text: 'text-gray-800', label: 'Brouillon' },
@@ -127,15 +174,25 @@ const ChantierDetails: React.FC = () => {
             <div className="bg-white rounded-lg shadow-md p-6">
                 <div className="flex flex-col sm:flex-row sm:justify-between sm:items-center gap-3 mb-6">
                     <h2 className="text-2xl font-bold text-gray-900">
-                        Avenants ({avenants.length})
+                        Avenants ({avenants.length}{nextCursor ? '+' : ''})
                     </h2>
-                    <Link
-                        to={`/create-avenant/${chantierId}`}
-                        className="flex items-center justify-center gap-2 bg-green-600 text-white px-4 py-2 rounded-lg hover:bg-green-700 transition"
-                    >
-                        <Plus size={18} />
-                        Nouvel Avenant
-                    </Link>
+                    <div className="flex flex-col sm:flex-row gap-2">
+                        <button
+                            onClick={exportAvenants}
+                            disabled={exporting || avenants.length === 0}
+                            className="flex items-center justify-center gap-2 bg-blue-600 text-white px-4 py-2 rounded-lg hover:bg-blue-700 transition disabled:opacity-50"
+                        >
+                            <Download size={18} />
+                            {exporting ? 'Export en cours...' : 'Exporter (ZIP)'}
+                        </button>
+                        <Link
+                            to={`/create-avenant/${chantierId}`}
+                            className="flex items-center justify-center gap-2 bg-green-600 text-white px-4 py-2 rounded-lg hover:bg-green-700 transition"
+                        >
+                            <Plus size={18} />
+                            Nouvel Avenant
+                        </Link>
+                    </div>
                 </div>
 
                 {avenants.length === 0 ? (
@@ -191,6 +248,16 @@ const ChantierDetails: React.FC = () => {
                                 </div>
                             </Link>
                         ))}
+
+                        {nextCursor && (
+                            <button
+                                onClick={fetchMoreAvenants}
+                                disabled={loadingMore}
+                                className="w-full border border-gray-200 rounded-lg py-2 text-gray-700 hover:bg-gray-50 transition disabled:opacity-50"
+                            >
+                                {loadingMore ? 'Chargement...' : "Charger plus d'avenants"}
+                            </button>
+                        )}
                     </div>
                 )}
             </div>
@@ -115,22 +115,28 @@ const CreateAvenant: React.FC = () => {
                 photoUrl = uploadRes.data.photo_url;
             }
 
-            const payload: any = {
-                chantier_id: chantierId,
-                description,
-                type,
-                photo_url: photoUrl,
-                signature_data: signatureData,
-            };
+            // Send the signature as a binary PNG part instead of a base64 string
+            const formData = new FormData();
+            formData.append('chantier_id', chantierId || '');
+            formData.append('description', description);
+            formData.append('type', type);
+            if (photoUrl) {
+                formData.append('photo_url', photoUrl);
+            }
 
             if (type === 'FORFAIT') {
-                payload.price = parseFloat(price);
+                formData.append('price', String(parseFloat(price)));
             } else {
-                payload.hours = parseFloat(hours);
-                payload.hourly_rate = parseFloat(hourlyRate);
+                formData.append('hours', String(parseFloat(hours)));
+                formData.append('hourly_rate', String(parseFloat(hourlyRate)));
+            }
+
+            if (signatureData) {
+                const signatureBlob = await (await fetch(signatureData)).blob();
+                formData.append('signature', signatureBlob, 'signature.png');
             }
 
-            const response = await axios.post(`${API_URL}/avenants/`, payload, {
+            const response = await axios.post(`${API_URL}/avenants/multipart`, formData, {
                 headers: { Authorization: `Bearer ${token}` }
             });
 
@@ -1,7 +1,7 @@
 import React, { useEffect, useState } from 'react';
 import { Link } from 'react-router-dom';
 import axios from 'axios';
-import { Plus, Calendar } from 'lucide-react';
+import { Plus, Calendar, FileText, Euro } from 'lucide-react';
 import { API_BASE_URL } from '../config';
 import CreateChantierModal from '../components/CreateChantierModal';
 
@@ -10,21 +10,27 @@ interface Chantier {
     name: string;
     address: string;
     created_at: string;
+    avenant_count: number;
+    signed_total_ht: number | string;  // Can be string from JSON numeric
+    last_avenant_at: string | null;
 }
 
 const Dashboard: React.FC = () => {
     const [chantiers, setChantiers] = useState<Chantier[]>([]);
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
     const [loading, setLoading] = useState(true);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [showCreateModal, setShowCreateModal] = useState(false);
 
     const fetchChantiers = async () => {
         try {
             setLoading(true);
             const token = localStorage.getItem('token');
-            const response = await axios.get(`${API_BASE_URL}/chantiers/`, {
+            const response = await axios.get(`${API_BASE_URL}/chantiers/summary`, {
                 headers: { Authorization: `Bearer ${token}` }
             });
-            setChantiers(response.data);
+            setChantiers(response.data.items);
+            setNextCursor(response.data.next_cursor);
         } catch (error) {
             console.error("Error fetching chantiers:", error);
         } finally {
@@ -32,6 +38,24 @@ const Dashboard: React.FC = () => {
         }
     };
 
+    const fetchMoreChantiers = async () => {
+        if (!nextCursor) return;
+        try {
+            setLoadingMore(true);
+            const token = localStorage.getItem('token');
+            const response = await axios.get(`${API_BASE_URL}/chantiers/summary`, {
+                headers: { Authorization: `Bearer ${token}` },
+                params: { cursor: nextCursor }
+            });
+            setChantiers((previous) => [...previous, ...response.data.items]);
+            setNextCursor(response.data.next_cursor);
+        } catch (error) {
+            console.error("Error fetching chantiers:", error);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     useEffect(() => {
         fetchChantiers();
     }, []);
@@ -60,10 +84,23 @@ const Dashboard: React.FC = () => {
                         <div key={chantier.id} className="bg-white p-6 rounded-lg shadow-md border border-slate-200 hover:shadow-lg transition">
                             <h2 className="text-xl font-semibold text-slate-800 mb-2">{chantier.name}</h2>
                             <p className="text-slate-500 mb-2">{chantier.address}</p>
-                            <div className="flex items-center gap-1 text-sm text-slate-400 mb-4">
+                            <div className="flex items-center gap-1 text-sm text-slate-400 mb-2">
                                 <Calendar size={14} />
                                 <span>Créé le {new Date(chantier.created_at).toLocaleDateString('fr-FR')}</span>
                             </div>
+                            <div className="flex flex-wrap items-center gap-3 text-sm text-slate-600 mb-4">
+                                <span className="flex items-center gap-1">
+                                    <FileText size={14} />
+                                    {chantier.avenant_count} avenant{chantier.avenant_count > 1 ? 's' : ''}
+                                </span>
+                                <span className="flex items-center gap-1">
+                                    <Euro size={14} />
+                                    {parseFloat(String(chantier.signed_total_ht)).toFixed(2)} € HT signés
+                                </span>
+                                {chantier.last_avenant_at && (
+                                    <span>Dernier le {new Date(chantier.last_avenant_at).toLocaleDateString('fr-FR')}</span>
+                                )}
+                            </div>
                             <Link
                                 to={`/chantier/${chantier.id}`}
                                 className="block w-full text-center bg-slate-100 text-slate-700 py-2 rounded hover:bg-slate-200 transition font-medium"
@@ -75,6 +112,18 @@ const Dashboard: React.FC = () => {
                 </div>
             )}
 
+            {!loading && nextCursor && (
+                <div className="text-center">
+                    <button
+                        onClick={fetchMoreChantiers}
+                        disabled={loadingMore}
+                        className="bg-slate-100 text-slate-700 px-4 py-2 rounded hover:bg-slate-200 transition font-medium disabled:opacity-50"
+                    >
+                        {loadingMore ? 'Chargement...' : 'Charger plus de chantiers'}
+                    </button>
+                </div>
+            )}
+
             <CreateChantierModal
                 isOpen={showCreateModal}
                 onClose={() => setShowCreateModal(false)}